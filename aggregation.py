@@ -0,0 +1,116 @@
+from collections import Counter
+
+from columns import RecordTable
+
+UNKNOWN_TITLE = 'Unknown Title'
+UNKNOWN_ARTIST = 'Unknown Artist'
+
+STAT_NAMES = ('Mean', 'Mode', 'Median', 'Variance', 'Standard Deviation', 'Min', 'Max', 'Count')
+
+
+def title_label(title):
+    title = title or UNKNOWN_TITLE
+    return title.strip('[]').strip() or UNKNOWN_TITLE
+
+
+def artist_label(artist_name):
+    return artist_name or UNKNOWN_ARTIST
+
+
+def resolve_title(item):
+    return title_label(item.get('title'))
+
+
+def resolve_artist(item):
+    # Prefer the normalized artist_name, fall back to the first person on a
+    # raw API record, and finally to 'Unknown Artist'
+    artist_name = item.get('artist_name')
+    if not artist_name and item.get('people'):
+        artist_name = item['people'][0].get('name')
+    return artist_label(artist_name)
+
+
+def summarize(counts):
+    # Summary statistics over the values of a Counter
+    return summarize_frequencies(Counter(counts.values()))
+
+
+def summarize_frequencies(frequencies):
+    # Summary statistics from a frequency-of-counts table ({count: how many
+    # keys have that count}), so everything below is linear in the number of
+    # distinct count values rather than keys.
+    n = sum(frequencies.values())
+    if n == 0:
+        stats = dict.fromkeys(STAT_NAMES)
+        stats['Count'] = 0
+        return stats
+
+    mean_value = sum(value * freq for value, freq in frequencies.items()) / n
+    # Ties resolve to the first value in the table's order; for a Counter
+    # that is insertion order, matching statistics.mode
+    mode_value = max(frequencies.items(), key=lambda pair: pair[1])[0]
+
+    ordered = sorted(frequencies.items())
+    lower_index, upper_index = (n - 1) // 2, n // 2
+    lower = upper = None
+    seen = 0
+    for value, freq in ordered:
+        if lower is None and seen + freq > lower_index:
+            lower = value
+        if seen + freq > upper_index:
+            upper = value
+            break
+        seen += freq
+    median_value = (lower + upper) / 2
+
+    variance_value = stdev_value = None
+    if n > 1:
+        variance_value = sum(freq * (value - mean_value) ** 2 for value, freq in ordered) / (n - 1)
+        stdev_value = variance_value ** 0.5
+
+    return {
+        'Mean': mean_value,
+        'Mode': mode_value,
+        'Median': median_value,
+        'Variance': variance_value,
+        'Standard Deviation': stdev_value,
+        'Min': ordered[0][0],
+        'Max': ordered[-1][0],
+        'Count': n,
+    }
+
+
+def aggregate(records):
+    # Count titles and artists and derive the summary statistics the report
+    # needs from those counts. A RecordTable is counted column-wise; any other
+    # iterable of records is counted in a single pass.
+    if isinstance(records, RecordTable):
+        title_counts = records.value_counts('title', title_label)
+        artist_counts = records.value_counts('artist_name', artist_label)
+        total = len(records)
+    else:
+        title_counts = Counter()
+        artist_counts = Counter()
+        total = 0
+        for item in records:
+            title_counts[resolve_title(item)] += 1
+            artist_counts[resolve_artist(item)] += 1
+            total += 1
+
+    return {
+        'total': total,
+        'title_counts': title_counts,
+        'artist_counts': artist_counts,
+        'title_stats': summarize(title_counts),
+        'artist_stats': summarize(artist_counts),
+    }
+
+
+def top_with_other(top, total):
+    # Top-N (label, count) pairs plus the long tail folded into one 'Other'
+    # bucket, as used by the dashboard charts
+    entries = [{'label': label, 'count': count} for label, count in top]
+    other = total - sum(entry['count'] for entry in entries)
+    if other > 0:
+        entries.append({'label': 'Other', 'count': other})
+    return entries
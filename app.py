@@ -1,439 +1,576 @@
-from flask import Flask, render_template, jsonify, send_file
-import requests
+from flask import Flask, render_template, jsonify, send_file, request, url_for, g
 from flask_caching import Cache
 from dotenv import load_dotenv
-from statistics import mean, mode, median, variance, stdev, StatisticsError
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Image, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from datetime import datetime
-from reportlab.lib.units import inch
 import io
 import os
-import json
-import matplotlib.pyplot as plt
 import re 
+import sqlite3
+import json
+from aggregation import UNKNOWN_ARTIST, aggregate, summarize_frequencies, top_with_other
+from report_cache import ReportCache, report_key
+from charts import CHART_FORMATS, CHART_TOP_N, CHARTS, DEFAULT_DPI, ChartArtifacts, chart_series, create_charts, snap_dpi
+from report import create_pdf_report
+from jobs import ReportJobs
+from upstream import TokenBucket, UpstreamClient
+from store import RECORD_FIELDS, ArtStore, start_background_sync, sync_store
+from search import SearchIndex
+from swr import stale_while_revalidate
+from compression import compress_response, encode_variants, select_variant
+import math
+import threading
+import time
+from metrics import REGISTRY, timed
+from images import FORMATS, DiskLRUCache, ImageProxy, ImageUnavailable, snap_width
+from workers import get_process_pool
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
-cache = Cache(app, config={'CACHE_TYPE': 'simple'})
+
+# Response cache. Set CACHE_TYPE=filesystem (with CACHE_DIR) or CACHE_TYPE=redis
+# (with CACHE_REDIS_URL) to share it between worker processes
+cache_config = {'CACHE_TYPE': os.getenv('CACHE_TYPE', 'simple')}
+for key in ('CACHE_DIR', 'CACHE_REDIS_URL', 'CACHE_KEY_PREFIX'):
+    if os.getenv(key):
+        cache_config[key] = os.getenv(key)
+cache = Cache(app, config=cache_config)
 
 # Get API key from environment variable
+# Chart worker processes re-import this module as __mp_main__ but never call
+# the API. Everything else set up below is lazy: the store, image cache and
+# process pools open files or start processes only on first use.
 API_KEY = os.getenv('HARVARD_API_KEY')
-if not API_KEY:
+if not API_KEY and __name__ != '__mp_main__':
     raise ValueError("API_KEY environment variable not set")
 
-BASE_URL = 'https://api.harvardartmuseums.org/object'
-
-def create_charts(data):
-    titles = []
-    artists = []
-
-    for item in data:
-        titles.append(item.get('title', 'Unknown Title'))
-        artist_name = item.get('artist_name', 'Unknown Artist')
-        if artist_name == 'Unknown Artist':
-            if 'people' in item and len(item['people']) > 0:
-                artist_name = item['people'][0].get('name', 'Unknown Artist')
-        artists.append(artist_name)
-
-    # Generate pie chart
-    plt.figure(figsize=(10, 8))
-    title_counts = {title: titles.count(title) for title in set(titles)}
-    cleaned_labels = [title.strip('[]').strip() for title in title_counts.keys()]
-    labels = cleaned_labels
-    counts = list(title_counts.values())
-    plt.pie(counts, labels=labels, autopct='%1.1f%%', startangle=140, pctdistance=0.85)
-    plt.title('Pieces of Art with the Same Name', fontsize=20)
-    pie_chart_path = 'static/pie_chart.png'
-    plt.savefig(pie_chart_path)
-    plt.close()
-
-    # Generate bar chart
-    plt.figure(figsize=(10, 6))
-    artist_counts = {artist: artists.count(artist) for artist in set(artists)}
-    if 'Unknown Artist' not in artist_counts:
-        artist_counts['Unknown Artist'] = 0
-    cleaned_artist_labels = [artist.strip('[]').strip() for artist in artist_counts.keys()]
-    labels = cleaned_artist_labels
-    counts = list(artist_counts.values())
-    plt.bar(labels, counts, color='skyblue')
-    plt.xlabel('Names of Artists', fontsize=15)
-    plt.ylabel('Count', fontsize=15)
-    plt.title('Artist Count Bar Chart', fontsize=20)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    bar_chart_path = 'static/bar_chart.png'
-    plt.savefig(bar_chart_path)
-    plt.close()
-
-    # Generate line chart
-    plt.figure(figsize=(10, 8))
-    title_counts = {title: titles.count(title) for title in set(titles)}
-    cleaned_title_labels = [title.strip('[]').strip() for title in title_counts.keys()]
-    labels = cleaned_title_labels
-    counts = list(title_counts.values())
-    plt.plot(labels, counts, marker='o', linestyle='-', color='b')
-    plt.xlabel('Names of Pieces', fontsize=14)  # Adjust font size
-    plt.ylabel('Count', fontsize=14)  # Adjust font size
-    plt.title('Pieces with the Same Title', fontsize=20)  # Adjust font size
-    plt.xticks(rotation=45, ha='right', fontsize=13)  # Adjust font size
-    plt.yticks(fontsize=10)  # Adjust font size
-    plt.tight_layout()
-    line_chart_path = 'static/line_chart.png'
-    plt.savefig(line_chart_path)
-    plt.close()
-
-    return pie_chart_path, bar_chart_path, line_chart_path
-
-def format_counts_as_table(counts):
-    data = [['Title', 'Count']]
-    for title, count in counts.items():
-        clean_title = title.strip('[]').strip()
-        data.append([clean_title, count])
-
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), '#d0d0d0'),
-        ('GRID', (0, 0), (-1, -1), 1, 'black'),
-        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONT', (0, 1), (-1, -1), 'Helvetica'),
-        ('SIZE', (0, 0), (-1, -1), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-
-    return table
-
-def format_statistics_table(data):
-    # Convert the data to numeric values
-    try:
-        numeric_data = [float(value) for value in data]
-    except ValueError:
-        # If conversion fails, return table with 'N/A' values
-        return Table([
-            ['Statistic', 'Value'],
-            ['Mean', 'N/A'],
-            ['Mode', 'N/A'],
-            ['Median', 'N/A'],
-            ['Variance', 'N/A'],
-            ['Standard Deviation', 'N/A'],
-            ['Min', 'N/A'],
-            ['Max', 'N/A'],
-            ['Count', 'N/A']
-        ])
-
-    # Calculate statistics
-    try:
-        count_value = len(numeric_data)
-        mean_value = round(mean(numeric_data), 2)
-        mode_value = mode(numeric_data)
-        median_value = median(numeric_data)
-        variance_value = round(sum((x - mean_value) ** 2 for x in numeric_data) / count_value, 2)
-        stdev_value = round(stdev(numeric_data), 2)
-        min_value = min(numeric_data)
-        max_value = max(numeric_data)
-    except StatisticsError:
-        # Handle cases where mode or other calculations fail
-        mode_value = 'N/A'
-        mean_value = median_value = variance_value = stdev_value = min_value = max_value = 'N/A'
-    
-    # Handle empty data case for variance and stdev
-    if count_value == 0:
-        variance_value = stdev_value = 'N/A'
-
-    # Create the statistics table
-    statistics_table_data = [
-        ['Statistic', 'Value'],
-        ['Mean', mean_value],
-        ['Mode', mode_value],
-        ['Median', median_value],
-        ['Variance', variance_value],
-        ['Standard Deviation', stdev_value],
-        ['Min', min_value],
-        ['Max', max_value],
-        ['Count', count_value]
-    ]
-
-    table = Table(statistics_table_data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), '#d0d0d0'),
-        ('GRID', (0, 0), (-1, -1), 1, 'black'),
-        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONT', (0, 1), (-1, -1), 'Helvetica'),
-        ('SIZE', (0, 0), (-1, -1), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-
-    return table
-def create_pdf_report(pie_chart_path, bar_chart_path, line_chart_path, title_counts, artist_counts):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-    width, height = letter
-    margin = 50
-    chart_height = 400
-    title_space = 20
-    chart_space = 20
-    additional_space = 20
-
-    # Header information
-    report_title = "Harvard Art Data Report"
-    author_name = "Christina Zimmer"
-    report_date = datetime.now().strftime("%B %d, %Y")
-
-    # Function to draw the header and footer
-    def draw_header_footer(canvas, doc):
-        canvas.saveState()
-        # Header
-        canvas.setFont('Helvetica-Bold', 10)
-        canvas.drawString(margin, height - margin + 20, report_title)
-        canvas.setFont('Helvetica', 10)
-        canvas.drawString(margin, height - margin + 5, f"Author: {author_name}")
-        canvas.drawString(margin, height - margin - 10, f"Date: {report_date}")
-        
-        # Footer
-        canvas.setFont('Helvetica', 10)
-        page_number_text = f"Page {doc.page}"
-        canvas.drawString(width - margin - 100, margin - 20, page_number_text)
-        
-        canvas.restoreState()
-
-    def generate_insights(stats):
-        mean_val = stats.get('Mean', 0)
-        mode_val = stats.get('Mode', 0)
-        median_val = stats.get('Median', 0)
-        variance_val = stats.get('Variance', 0)
-        std_dev_val = stats.get('Standard Deviation', 0)
-        min_val = stats.get('Min', 0)
-        max_val = stats.get('Max', 0)
-        count_val = stats.get('Count', 0)
-
-        insights = []
-        insights.append(f"The statistical analysis reveals the following insights:")
-        if mean_val:
-            insights.append(f"The mean value is {mean_val:.2f}, indicating the average count.")
-        if mode_val:
-            insights.append(f"The mode value is {mode_val:.2f}, representing the most frequently occurring count.")
-        if median_val:
-            insights.append(f"The median value is {median_val:.2f}, showing the middle value in the dataset.")
-        if variance_val:
-            insights.append(f"The variance is {variance_val:.2f}, reflecting the dispersion of the counts.")
-        if std_dev_val:
-            insights.append(f"The standard deviation is {std_dev_val:.2f}, which measures the spread of the counts.")
-        if min_val and max_val:
-            insights.append(f"The minimum value is {min_val:.2f} and the maximum value is {max_val:.2f}, showing the range of counts.")
-        if count_val:
-            insights.append(f"The total number of data points is {count_val}.")
-        
-        return "\n".join(insights)
-
-    def add_chart(title, image_path, conclusion_text, table_data, additional_insights=None, stats_table=None, summary=None):
-        elements.append(Paragraph(title, ParagraphStyle(name='Title', fontSize=14, fontName='Helvetica-Bold')))
-        elements.append(Spacer(1, title_space))  # Space for the title
-        elements.append(Image(image_path, width=width - 2 * margin, height=chart_height))
-        elements.append(Spacer(1, chart_space))  # Space between chart and conclusion
-        
-        if conclusion_text:
-            elements.append(Paragraph("Conclusion:", ParagraphStyle(name='ConclusionTitle', fontSize=12, fontName='Helvetica-Bold')))
-            elements.append(Spacer(1, 10))
-            elements.append(Paragraph(conclusion_text, ParagraphStyle(name='ConclusionText', fontSize=12, fontName='Helvetica')))
-            elements.append(Spacer(1, 10))
-
-        if table_data:
-            elements.append(table_data)
-            elements.append(Spacer(1, 10))
-
-        if additional_insights:
-            elements.append(Paragraph("Additional Insights:", ParagraphStyle(name='AdditionalInsightsTitle', fontSize=12, fontName='Helvetica-Bold')))
-            elements.append(Spacer(1, 10))
-            elements.append(Paragraph(additional_insights, ParagraphStyle(name='AdditionalInsightsText', fontSize=12, fontName='Helvetica')))
-            elements.append(Spacer(1, additional_space))
-
-        if stats_table:
-            elements.append(stats_table)
-            elements.append(Spacer(1, additional_space))
-        
-        if summary:
-            elements.append(Paragraph("Summary:", ParagraphStyle(name='SummaryTitle', fontSize=12, fontName='Helvetica-Bold')))
-            elements.append(Spacer(1, 10))
-            elements.append(Paragraph(summary, ParagraphStyle(name='SummaryText', fontSize=12, fontName='Helvetica')))
-            elements.append(Spacer(1, additional_space))
-        
-        elements.append(PageBreak())
-
-    pie_chart_conclusion = (
-        "The pie chart provides an informative and visually engaging depiction of the distribution of artwork pieces that share identical titles. By presenting the data in this way, the chart highlights the relative frequency of each title within the dataset. This representation can be particularly revealing, offering insights into patterns or trends in the way artworks are named. "
-        "For instance, a concentration of pieces with the same title might suggest that certain themes or concepts are popular among artists, indicating either a series of works centered around a common idea or a prevalent trend in artistic naming conventions. Alternatively, it could reflect a shared influence or cultural reference that resonates across multiple artists. "
-        "The chart not only helps in visualizing these patterns but also allows for a comparative analysis of how titles are distributed. By examining the sections of the pie chart, one can discern which titles are more common and which are less so, providing a clearer understanding of the dataset's composition. The specific counts for each title are detailed below, offering a quantitative breakdown that complements the visual overview provided by the chart."
-    )
-    pie_chart_stats = format_statistics_table(list(title_counts.values()))
-    additional_pie_chart_insights = generate_insights({
-        'Mean': mean(title_counts.values()),
-        'Mode': mode(title_counts.values()) if len(title_counts.values()) > 1 else None,
-        'Median': median(title_counts.values()),
-        'Variance': variance(title_counts.values()) if len(title_counts.values()) > 1 else None,
-        'Standard Deviation': (variance(title_counts.values())**0.5) if len(title_counts.values()) > 1 else None,
-        'Min': min(title_counts.values()),
-        'Max': max(title_counts.values()),
-        'Count': len(title_counts.values())
-    })
-    pie_chart_summary = (
-        "The pie chart provides a visual representation of the distribution of artwork pieces that share identical titles. This type of chart is particularly useful for understanding patterns within a collection, revealing whether there are common themes or trends in the way artists title their works. By examining the proportions displayed, one can gain insights into the prevalence of specific titles, which might indicate a popular series, a recurring motif, or a broader trend within the art world. "
-        "The chart breaks down the frequency of each title, offering a clear view of how often each title appears in the dataset."
-    )
-    add_chart("Pie Chart", pie_chart_path, pie_chart_conclusion, format_counts_as_table(title_counts), additional_pie_chart_insights, pie_chart_stats, pie_chart_summary)
-    
-    bar_chart_conclusion = (
-    "The bar chart provides a comprehensive visual representation of the distribution of artwork pieces across different artists. It effectively illustrates the number of pieces attributed to each artist, highlighting the relative abundance of works by individual artists within the dataset. By displaying this information in a bar chart format, one can easily compare the volume of artworks created by various artists, thereby identifying which artists have a more substantial presence in the collection, or the lack of their record in the Harvard Database. In the latter case, it helps showcase just how much of history is lost due to a failure of record. This chart is instrumental in understanding the distribution of artistic contributions and can reveal patterns or trends related to the popularity or prolificacy of certain artists as well as a failure on our part to properly document data. The following section enumerates the specific counts of artwork attributed to each artist, offering a clear and quantifiable view of their contributions or lack thereof."
-    )
-    bar_chart_summary = (
-    "The bar chart offers an insightful depiction of how artwork pieces are distributed among various artists, providing a clear view of the number of works attributed to each individual. This visualization effectively highlights the relative prominence of artists within the dataset, making it easy to compare the volume of their contributions. By examining this chart, one can quickly identify artists who have a significant presence in the collection as well as those who are underrepresented or missing entirely from the Harvard Database. In cases where artists are not adequately represented, the chart underscores the potential historical gaps and the impact of incomplete record-keeping. This analysis not only sheds light on the artistic contributions of various individuals but also reveals patterns related to their popularity, prolificacy, and the challenges of maintaining comprehensive records. The subsequent section details the specific counts of artwork attributed to each artist, providing a quantitative breakdown of their contributions or the lack thereof."
-    )
-
-    bar_chart_stats = format_statistics_table(list(artist_counts.values()))
-    additional_bar_chart_insights = generate_insights({
-        'Mean': mean(artist_counts.values()),
-        'Mode': mode(artist_counts.values()) if len(artist_counts.values()) > 1 else None,
-        'Median': median(artist_counts.values()),
-        'Variance': variance(artist_counts.values()) if len(artist_counts.values()) > 1 else None,
-        'Standard Deviation': (variance(artist_counts.values())**0.5) if len(artist_counts.values()) > 1 else None,
-        'Min': min(artist_counts.values()),
-        'Max': max(artist_counts.values()),
-        'Count': len(artist_counts.values())
-    })
-    add_chart("Bar Chart", bar_chart_path, bar_chart_conclusion, format_counts_as_table(artist_counts), additional_bar_chart_insights, bar_chart_stats, bar_chart_summary)
-
-    line_chart_conclusion = (
-           "The line chart provides a detailed view of the distribution of artwork pieces that share identical titles, based on data from the Harvard Museum. This chart highlights the number of pieces for each title, offering a clear picture of how common or rare certain titles are within the collection. By visualizing the counts of pieces with the same title, the chart reveals patterns and trends in title prevalence, reflecting artistic preferences and naming conventions. The visualization helps to identify titles with high or low occurrences, showcasing variations in the dataset without specifying particular time periods. The subsequent section provides a detailed count for each title, offering a precise breakdown of the number of pieces associated with each title."
+BASE_URL = os.getenv('HARVARD_API_URL', 'https://api.harvardartmuseums.org/object')
+
+# Harvester settings: page size, parallel page fetches, upstream requests per
+# second and an optional cap on the number of pages walked (0 = all pages)
+HARVEST_PAGE_SIZE = int(os.getenv('HARVEST_PAGE_SIZE', 100))
+HARVEST_WORKERS = int(os.getenv('HARVEST_WORKERS', 4))
+HARVEST_RATE = float(os.getenv('HARVEST_RATE', 5))
+HARVEST_MAX_PAGES = int(os.getenv('HARVEST_MAX_PAGES', 0)) or None
+
+# Every upstream request (harvest pages and image fetches) goes through one
+# client: a shared connection pool, per-request connect/read timeouts and
+# jittered retries on 429/5xx. Only harvest pages count against HARVEST_RATE.
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', 5))
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', 30))
+UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', 3))
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', 10))
+
+upstream_timeout = (UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT)
+api_client = UpstreamClient(
+    pool_size=max(UPSTREAM_POOL_SIZE, HARVEST_WORKERS),
+    timeout=upstream_timeout,
+    retries=UPSTREAM_RETRIES,
+    rate_limiter=TokenBucket(HARVEST_RATE),
+)
+image_client = UpstreamClient(pool_size=UPSTREAM_POOL_SIZE, timeout=upstream_timeout, retries=UPSTREAM_RETRIES)
+
+# Local object store that both endpoints read from, kept up to date by a
+# background sync job (SYNC_INTERVAL seconds, 0 disables the job)
+ART_STORE_PATH = os.getenv('ART_STORE_PATH', 'art_data.db')
+SYNC_INTERVAL = int(os.getenv('SYNC_INTERVAL', 300))
+
+store = ArtStore(ART_STORE_PATH)
+
+# Title, artist, image and link indexes for /api/search, caught up from the
+# store's change log after every sync and before every search
+search_index = SearchIndex(store)
+
+def sync():
+    # Every serving process runs this loop; sync_store lets only one of them
+    # harvest per interval
+    total = sync_store(
+        store, api_client, BASE_URL, API_KEY,
+        min_interval=SYNC_INTERVAL / 2,
+        size=HARVEST_PAGE_SIZE,
+        max_workers=HARVEST_WORKERS,
+        max_pages=HARVEST_MAX_PAGES,
     )
-    line_chart_summary = (
-    "The line chart visually represents the distribution of artwork pieces with identical titles within the dataset from the Harvard Museum. This chart provides an overview of how often each title appears, regardless of the specific time periods of the artworks. It highlights variations in the number of pieces with the same title, allowing for the identification of trends and patterns in title frequency. By examining this chart, one can discern which titles are more prevalent and how their distribution varies across the dataset. This summary section enumerates the exact counts for each title, offering a clear and detailed view of the title distribution."
-    )
-    line_chart_stats = format_statistics_table(list(title_counts.values()))
-    additional_line_chart_insights = generate_insights({
-        'Mean': mean(title_counts.values()),
-        'Mode': mode(title_counts.values()) if len(title_counts.values()) > 1 else None,
-        'Median': median(title_counts.values()),
-        'Variance': variance(title_counts.values()) if len(title_counts.values()) > 1 else None,
-        'Standard Deviation': (variance(title_counts.values())**0.5) if len(title_counts.values()) > 1 else None,
-        'Min': min(title_counts.values()),
-        'Max': max(title_counts.values()),
-        'Count': len(title_counts.values())
-    })
-    add_chart("Line Chart", line_chart_path, line_chart_conclusion, format_counts_as_table(title_counts), additional_line_chart_insights, line_chart_stats, line_chart_summary)
-
-    # Build the PDF with header and footer on each page
-    doc.build(elements, onFirstPage=draw_header_footer, onLaterPages=draw_header_footer)
-
-    buffer.seek(0)
-    return buffer
-
+    search_index.refresh()
+    return total
+
+# /api/data responses are fresh for DATA_CACHE_FRESH seconds and then served
+# stale for up to DATA_CACHE_STALE seconds while a background refresh runs
+DATA_CACHE_FRESH = int(os.getenv('DATA_CACHE_FRESH', 60))
+DATA_CACHE_STALE = int(os.getenv('DATA_CACHE_STALE', 3600))
+
+# Pagination limits for /api/data
+DEFAULT_PER_PAGE = 100
+MAX_PER_PAGE = 1000
+
+# Number of labels /api/stats returns per dimension before the 'Other' bucket
+DEFAULT_STATS_TOP = 20
+MAX_STATS_TOP = 200
+
+# Finished PDFs keyed by a hash of their input counts, bounded by total size
+REPORT_CACHE_BYTES = int(os.getenv('REPORT_CACHE_BYTES', 64 * 1024 * 1024))
+report_cache = ReportCache(REPORT_CACHE_BYTES)
+
+# Image proxy: thumbnails of each object's primary image, cached on disk
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', 'image_cache')
+IMAGE_CACHE_BYTES = int(os.getenv('IMAGE_CACHE_BYTES', 512 * 1024 * 1024))
+IMAGE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Rendered charts keyed by a hash of the counts they draw, shared by the PDF
+# builder and /api/charts and redrawn only when those counts change
+CHART_CACHE_BYTES = int(os.getenv('CHART_CACHE_BYTES', 32 * 1024 * 1024))
+chart_artifacts = ChartArtifacts(ReportCache(CHART_CACHE_BYTES, name='chart'), executor=get_process_pool())
+
+image_proxy = ImageProxy(image_client, DiskLRUCache(IMAGE_CACHE_DIR, IMAGE_CACHE_BYTES), executor=get_process_pool())
+
+# The sync job runs once per serving process. Under the Werkzeug reloader
+# (python app.py, flask run --debug) a watcher process imports this module as
+# well but never serves, and chart worker processes re-import it as
+# __mp_main__, so neither may start it at import.
+sync_lock = threading.Lock()
+sync_stop = None
+
+def start_sync():
+    global sync_stop
+    with sync_lock:
+        if sync_stop is None and SYNC_INTERVAL > 0:
+            sync_stop = start_background_sync(sync, SYNC_INTERVAL)
+
+# WSGI servers such as gunicorn import the module in the serving process
+if __name__ not in ('__main__', '__mp_main__') and not os.getenv('FLASK_RUN_FROM_CLI'):
+    start_sync()
+
+@app.before_request
+def ensure_sync():
+    # Development servers start the job from their first request
+    if sync_stop is None:
+        start_sync()
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def load_art_data(fields=RECORD_FIELDS):
+    # Read the synced collection from the local store into columns and
+    # serialize straight from them. This is a full scan per call, so it only
+    # runs when the /api/data cache is cold or being refreshed.
+    table = store.load_table(fields)
+    with timed('serialization'):
+        return table.to_json()
+
+def load_art_page(fields, per_page, page, cursor):
+    # One page of the collection in the same records/info envelope as the
+    # upstream API. With a cursor the page is read by keyset instead of offset.
+    offset = 0 if cursor is not None else (page - 1) * per_page
+    records, last_id = store.page(fields, limit=per_page, offset=offset, after=cursor)
+    total = store.count()
+    with timed('serialization'):
+        return json.dumps({
+            'info': {
+                'totalrecords': total,
+                'per_page': per_page,
+                'pages': math.ceil(total / per_page),
+                'page': page if cursor is None else None,
+                'next_cursor': last_id if len(records) == per_page else None,
+            },
+            'records': records,
+        })
+
+def iter_ndjson(records, batch_size=500):
+    # Serialize one record per line, yielding in batches so each chunk is
+    # worth a write without holding more than a batch in memory
+    def serialize(batch):
+        with timed('serialization'):
+            return ''.join(json.dumps(record) + '\n' for record in batch)
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield serialize(batch)
+            batch = []
+    if batch:
+        yield serialize(batch)
+
+def requested_fields():
+    fields = request.args.get('fields')
+    if not fields:
+        return RECORD_FIELDS
+    fields = tuple(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in RECORD_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(RECORD_FIELDS)}")
+    return fields
+
+def wants_ndjson():
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+def int_arg(name):
+    # An optional integer query parameter; values that do not parse are an
+    # error rather than silently ignored
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer, got {value!r}') from None
+
 @app.route('/api/data')
-@cache.cached(timeout=60)  # Cache the response for 60 seconds
 def get_data():
     try:
-        response = requests.get(f'{BASE_URL}?apikey={API_KEY}')
-        response.raise_for_status()
-        data = response.json()
-
-        # Log raw response for debugging
-        app.logger.info(f'Raw API response: {data}')
-
-        # Extract relevant fields for the frontend
-        art_data = []
-        for item in data.get('records', []):
-            title = item.get('title')
-            image_url = item.get('primaryimageurl')
-            artist_name = None
-            persistent_link = item.get('url', 'No link available')  # Extract the persistent link
-
-            # Log item being processed for debugging
-            app.logger.info(f'Processing item: {item}')
-
-            # Skip items without a title
-            if not title:
-                app.logger.info('Skipped item without title')
-                continue
-            title = title.replace('[', '').replace(']', '').strip()
-            
-            # Extract artist name if available
-            if 'people' in item and len(item['people']) > 0:
-                artist_name = item['people'][0].get('name', 'Unknown artist')
-
-            # Ensure image_url is valid
-            if image_url:
-                # If the image URL is relative, convert it to absolute
-                if not image_url.startswith('http'):
-                    image_url = f'https://api.harvardartmuseums.org{image_url}'
+        fields = requested_fields()
+        page = int_arg('page')
+        per_page = int_arg('per_page')
+        cursor = int_arg('cursor')
+        paginated = page is not None or per_page is not None or cursor is not None
+        page = max(page or 1, 1)
+        per_page = min(max(per_page or DEFAULT_PER_PAGE, 1), MAX_PER_PAGE)
+
+        # NDJSON streams straight from the store, one record per line
+        if wants_ndjson():
+            if paginated:
+                offset = 0 if cursor is not None else (page - 1) * per_page
+                records, _ = store.page(fields, limit=per_page, offset=offset, after=cursor)
             else:
-                # Provide a default image URL or placeholder if necessary
-                image_url = 'https://cdn.vectorstock.com/i/500p/82/99/no-image-available-like-missing-picture-vector-43938299.jpg'
-
-            art_data.append({
-                'title': title,
-                'image_url': image_url,
-                'artist_name': artist_name,
-                'persistent_link': persistent_link  # Add the persistent link
+                records = store.iter_records(fields)
+            return app.response_class(iter_ndjson(records), mimetype='application/x-ndjson')
+
+        if paginated:
+            key = f"api-data:encoded:{','.join(fields)}:{page}:{per_page}:{cursor}"
+            load = lambda: load_art_page(fields, per_page, page, cursor)
+        else:
+            key = f"api-data:encoded:{','.join(fields)}"
+            load = lambda: load_art_data(fields)
+
+        # The cache holds the body already compressed in every encoding, so
+        # hits only pick the variant the client accepts
+        variants = stale_while_revalidate(
+            cache, key, lambda: encode_variants(load().encode('utf-8')),
+            fresh_for=DATA_CACHE_FRESH,
+            stale_for=DATA_CACHE_STALE,
+        )
+        body, encoding = select_variant(variants, request.accept_encodings)
+        response = app.response_class(body, mimetype='application/json')
+        response.vary.add('Accept-Encoding')
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        app.logger.error('Error reading data: %s', e)
+        return jsonify({'error': str(e)}), 500
+
+def parse_bool(value):
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f'Expected true or false, got {value!r}')
+
+@app.route('/api/search')
+def search():
+    # Filters combine with AND: q matches title words, title is a title
+    # prefix, artist an exact artist name (both case-insensitive), has_image
+    # true/false and link a persistent link or its id
+    try:
+        fields = requested_fields()
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', DEFAULT_PER_PAGE, type=int), 1), MAX_PER_PAGE)
+        ids = search_index.search(
+            text=request.args.get('q'),
+            title=request.args.get('title'),
+            artist=request.args.get('artist'),
+            has_image=parse_bool(request.args.get('has_image')),
+            link=request.args.get('link'),
+        )
+        records = store.get_many(ids[(page - 1) * per_page:page * per_page], fields)
+        with timed('serialization'):
+            body = json.dumps({
+                'info': {
+                    'totalrecords': len(ids),
+                    'per_page': per_page,
+                    'pages': math.ceil(len(ids) / per_page),
+                    'page': page,
+                },
+                'records': records,
             })
+        return app.response_class(body, mimetype='application/json')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        app.logger.error('Error reading data: %s', e)
+        return jsonify({'error': str(e)}), 500
 
-        # Log final art data for debugging
-        app.logger.info(f'Final art data: {art_data}')
+def load_stats(top):
+    # Everything here reads the running count tables, so the cost depends on
+    # the number of distinct titles/artists, not on the size of the collection
+    total = store.count()
+    stats = {'total': total}
+    for dimension in ('title', 'artist'):
+        frequencies = store.count_frequencies(dimension)
+        stats[f'{dimension}s'] = {
+            'distinct': sum(frequencies.values()),
+            'counts': top_with_other(store.top_counts(dimension, top), total),
+            'statistics': summarize_frequencies(frequencies),
+        }
+    with timed('serialization'):
+        return json.dumps(stats)
+
+@app.route('/api/stats')
+def get_stats():
+    try:
+        top = min(max(request.args.get('top', DEFAULT_STATS_TOP, type=int), 1), MAX_STATS_TOP)
+        body = stale_while_revalidate(
+            cache, f'api-stats:{top}', lambda: load_stats(top),
+            fresh_for=DATA_CACHE_FRESH,
+            stale_for=DATA_CACHE_STALE,
+        )
+        response = app.response_class(body, mimetype='application/json')
+        response.cache_control.public = True
+        response.cache_control.max_age = DATA_CACHE_FRESH
+        response.add_etag()
+        return response.make_conditional(request)
+    except sqlite3.Error as e:
+        app.logger.error('Error reading stats: %s', e)
+        return jsonify({'error': str(e)}), 500
 
-        # Write JSON data to a file
-        with open('art_data.json', 'w') as file:
-            json.dump(art_data, file, indent=4)
+@app.route('/img/<int:object_id>')
+def get_image(object_id):
+    try:
+        record = store.get(object_id, fields=('image_url',))
+    except sqlite3.Error as e:
+        app.logger.error('Error reading data: %s', e)
+        return jsonify({'error': str(e)}), 500
+    if record is None or not record['image_url']:
+        return jsonify({'error': 'Unknown object'}), 404
 
-        return jsonify(art_data)
-    except requests.RequestException as e:
-        app.logger.error(f'Error fetching data: {e}')
+    width = snap_width(request.args.get('w', 320, type=int))
+    fmt = 'webp' if request.accept_mimetypes['image/webp'] else 'jpeg'
+    try:
+        path = image_proxy.get(record['image_url'], width, fmt)
+    except ImageUnavailable as e:
+        app.logger.error('Error fetching image for object %s: %s', object_id, e)
+        return jsonify({'error': str(e)}), 502
+    if path is None:
+        return jsonify({'error': 'Image unavailable'}), 503
+
+    # Thumbnails never change for a given URL, so let browsers keep them.
+    # The cache touches a file's mtime on every hit, so the ETag is the
+    # file's content-addressed name rather than derived from its mtime;
+    # send_file handles conditional and Range requests
+    response = send_file(path, mimetype=FORMATS[fmt], conditional=True, max_age=IMAGE_MAX_AGE,
+                         etag=os.path.basename(path))
+    response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response
+
+@app.route('/api/charts/<name>')
+def get_chart(name):
+    # The dashboard charts drawn from the running count tables, as PNG
+    # (?dpi=100/200/300) or SVG (?format=svg), with ?labels=0 leaving out the
+    # title and artist names. The URL is stable, so the ETag carries the
+    # version and browsers revalidate on every use.
+    if name not in CHARTS:
+        return jsonify({'error': f"Unknown chart. Choose from: {', '.join(CHARTS)}"}), 404
+    fmt = request.args.get('format', 'png')
+    if fmt not in CHART_FORMATS:
+        return jsonify({'error': f"Unknown format. Choose from: {', '.join(CHART_FORMATS)}"}), 400
+    dpi = snap_dpi(request.args.get('dpi', DEFAULT_DPI, type=int))
+
+    try:
+        show_labels = parse_bool(request.args.get('labels')) is not False
+        _, dimension = CHARTS[name]
+        labels, counts = chart_series(
+            name, store.top_counts(dimension, CHART_TOP_N), store.count(),
+            store.label_count('artist', UNKNOWN_ARTIST) if dimension == 'artist' else 0,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except sqlite3.Error as e:
+        app.logger.error('Error reading data: %s', e)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/report')
-def generate_report():
+    etag = chart_artifacts.key(name, labels, counts, fmt, dpi, show_labels)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        try:
+            with timed('chart_render'):
+                image = chart_artifacts.get(name, labels, counts, fmt, dpi, show_labels)
+        except Exception as e:
+            app.logger.exception('Rendering chart %s failed', name)
+            return jsonify({'error': f'Chart render failed: {e}'}), 500
+        response = app.response_class(image, mimetype=CHART_FORMATS[fmt])
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def compress(response):
+    return compress_response(response, request.accept_encodings)
+
+@app.after_request
+def record_request_duration(response):
+    # Streamed bodies are still being produced at this point, so for those
+    # this measures time to first byte
+    start = g.pop('request_start', None)
+    if start is not None:
+        REGISTRY.observe('app_request_duration_seconds', time.perf_counter() - start,
+                         endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
+
+# The only columns the report reads
+REPORT_FIELDS = ('title', 'artist_name')
+
+# Until the first sync has finished there is nothing to report on
+NOT_SYNCED = 'Collection not synced yet, try again shortly'
+
+class ReportError(Exception):
+    pass
+
+def build_report(aggregated, report_date, progress=None):
     try:
-        response = requests.get(f'{BASE_URL}?apikey={API_KEY}')
-        response.raise_for_status()
-        data = response.json().get('records', [])
-
-        # Generate charts and get paths
-        pie_chart_path, bar_chart_path, line_chart_path = create_charts(data)
-
-        # Extract titles and artists from the data
-        titles = [item.get('title', 'Unknown Title') for item in data]
-        artists = [item.get('artist_name', 'Unknown Artist') for item in data]
-        # Handle cases where 'people' field is present
-        for item in data:
-            if 'people' in item and len(item['people']) > 0:
-                artist_name = item['people'][0].get('name', 'Unknown Artist')
-                if artist_name not in artists:
-                    artists.append(artist_name)
-
-        # Get counts for the conclusion
-        title_counts = {title: titles.count(title) for title in set(titles)}
-        artist_counts = {artist: artists.count(artist) for artist in set(artists)}
+        # Render the charts in memory
+        if progress:
+            progress('rendering charts', 0.3)
+        with timed('chart_render'):
+            pie_chart, bar_chart, line_chart = create_charts(aggregated, artifacts=chart_artifacts)
 
         # Generate PDF report with counts
-        pdf_buffer = create_pdf_report(pie_chart_path, bar_chart_path, line_chart_path, title_counts, artist_counts)
+        if progress:
+            progress('building pdf', 0.6)
+        with timed('pdf_build'):
+            pdf_buffer = create_pdf_report(pie_chart, bar_chart, line_chart, aggregated, report_date)
+    except Exception as e:
+        app.logger.exception('Report build failed')
+        raise ReportError(f'Report build failed: {e}') from e
+    return pdf_buffer.getvalue()
+
+def aggregate_report(progress=None):
+    # Count titles and artists once, column-wise, and share the result with
+    # the charts and the PDF
+    if progress is not None:
+        progress('aggregating', 0.1)
+    with timed('aggregation'):
+        return aggregate(store.load_table(REPORT_FIELDS))
+
+def run_report_job(progress):
+    # The key and the aggregated table are read from one snapshot, so a
+    # sync in between cannot put newer content under an older key
+    with store.snapshot():
+        if store.count() == 0:
+            raise ReportError(NOT_SYNCED)
+        report_date = datetime.now().strftime("%B %d, %Y")
+        return report_cache.get_or_build(
+            report_key(store.version(), report_date),
+            lambda: build_report(aggregate_report(progress), report_date, progress),
+        )
+
+# Background report builds; status and finished PDFs live in the response
+# cache (shared between workers with CACHE_TYPE=redis or filesystem) for
+# REPORT_JOB_TTL seconds
+REPORT_JOB_WORKERS = int(os.getenv('REPORT_JOB_WORKERS', 2))
+REPORT_JOB_TTL = int(os.getenv('REPORT_JOB_TTL', 3600))
+report_jobs = ReportJobs(run_report_job, cache, max_workers=REPORT_JOB_WORKERS, ttl=REPORT_JOB_TTL)
+
+def job_status(job):
+    job = dict(job)
+    job['status_url'] = url_for('report_job_status', job_id=job['id'])
+    job['download_url'] = url_for('download_report', job_id=job['id'])
+    return job
+
+@app.route('/api/report')
+def generate_report():
+    try:
+        # The key and, on a miss, the aggregated table are read from one
+        # snapshot, so a sync in between cannot put newer content under an
+        # older key. Single-flight builds run on the requesting thread.
+        with store.snapshot():
+            if store.count() == 0:
+                response = jsonify({'error': NOT_SYNCED})
+                response.status_code = 503
+                response.headers['Retry-After'] = '30'
+                return response
+
+            # The store version and the report date identify the PDF, so the
+            # key doubles as a strong ETag and a 304 costs one index lookup
+            report_date = datetime.now().strftime("%B %d, %Y")
+            etag = report_key(store.version(), report_date)
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+
+            # Aggregate and build the PDF only on a cache miss, and at most
+            # once per distinct input, however many requests are waiting
+            pdf = report_cache.get_or_build(etag, lambda: build_report(aggregate_report(), report_date))
 
         # Send PDF file to client
-        return send_file(
-            pdf_buffer,
+        response = send_file(
+            io.BytesIO(pdf),
             as_attachment=True,
             download_name='report.pdf',
             mimetype='application/pdf'
         )
-    except requests.RequestException as e:
-        app.logger.error(f'Error fetching data: {e}')
+        response.set_etag(etag)
+        return response
+    except ReportError as e:
+        return jsonify({'error': str(e)}), 500
+    except sqlite3.Error as e:
+        app.logger.error('Error reading data: %s', e)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/report', methods=['POST'])
+def create_report_job():
+    job = report_jobs.submit()
+    response = jsonify(job_status(job))
+    response.status_code = 202
+    response.headers['Location'] = url_for('report_job_status', job_id=job['id'])
+    return response
+
+@app.route('/api/report/<job_id>')
+def report_job_status(job_id):
+    job = report_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired report job'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/api/report/<job_id>/download')
+def download_report(job_id):
+    job = report_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired report job'}), 404
+    if job['status'] != 'done':
+        return jsonify(job_status(job)), 409
+
+    pdf = report_jobs.result(job_id)
+    if pdf is None:
+        return jsonify({'error': 'Unknown or expired report job'}), 404
+
+    return send_file(
+        io.BytesIO(pdf),
+        as_attachment=True,
+        download_name='report.pdf',
+        mimetype='application/pdf'
+    )
+
 if __name__ == '__main__':
+    # Only the reloader's child process serves requests
+    if os.getenv('WERKZEUG_RUN_MAIN') == 'true':
+        start_sync()
     app.run(debug=True)
\ No newline at end of file
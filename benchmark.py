@@ -0,0 +1,264 @@
+# Offline benchmark for the data and report paths. Synthetic Harvard API
+# envelopes are served by the local stub (stub_api.py), synced into a fresh
+# store per size, and the endpoints are driven through the Flask test client:
+#
+#     python benchmark.py                         # 100, 10k and 100k records
+#     python benchmark.py --sizes 100 10000 --repeat 5
+#     python benchmark.py --compare benchmarks/results-previous.json
+#
+# Results are written as JSON under benchmarks/ so runs can be compared
+# between releases; --compare exits non-zero when a step's p50 or its peak
+# memory growth regresses by more than --threshold.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from stub_api import StubServer, make_records
+from workers import get_process_pool
+
+DEFAULT_SIZES = (100, 10000, 100000)
+
+# Peak memory growth below this many MB is never reported as a regression
+MEMORY_FLOOR_MB = 5
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def process_rss_mb(pid='self'):
+    # Resident set size of one process right now (Linux only)
+    try:
+        with open(f'/proc/{pid}/statm') as file:
+            return int(file.read().split()[1]) * PAGE_SIZE / 2 ** 20
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def current_rss_mb():
+    # This process plus the chart, PDF and thumbnail workers, which do most
+    # of the report steps' work. Workers started during a step count
+    # towards its growth.
+    own = process_rss_mb()
+    if own is None:
+        return None
+    return own + sum(process_rss_mb(pid) or 0 for pid in get_process_pool().pids())
+
+
+class RSSSampler:
+    # Samples the current RSS on a background thread while a step runs, so
+    # each step reports its own peak rather than the process's lifetime
+    # high-water mark
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stop = threading.Event()
+        self.start_mb = self.peak_mb = current_rss_mb()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak_mb = max(self.peak_mb, rss)
+
+    def __enter__(self):
+        if self.start_mb is not None:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start_mb is not None:
+            self.stop.set()
+            self.thread.join()
+            self.sample()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(name, size, repeat, func):
+    timings = []
+    with RSSSampler() as rss:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    measured = rss.start_mb is not None
+    total = sum(timings)
+    result = {
+        'step': name,
+        'records': size,
+        'repeat': repeat,
+        'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'ops_per_sec': round(repeat / total, 3) if total else None,
+        'records_per_sec': round(size * repeat / total, 1) if total else None,
+        'rss_start_mb': round(rss.start_mb, 1) if measured else None,
+        'rss_peak_mb': round(rss.peak_mb, 1) if measured else None,
+        'rss_delta_mb': round(rss.peak_mb - rss.start_mb, 1) if measured else None,
+    }
+    memory = f"+{result['rss_delta_mb']:>7.1f} MB" if measured else 'n/a'
+    print(f"{size:>7} {name:<28} p50 {result['p50_ms']:>10.2f} ms  p99 {result['p99_ms']:>10.2f} ms  "
+          f"rss {memory}", flush=True)
+    return result
+
+
+def expect(response, status=200):
+    if response.status_code != status:
+        raise RuntimeError(f'{response.request.path}: expected {status}, got {response.status_code}')
+    return response
+
+
+def run_size(app_module, server, size, repeat, skip_report):
+    from aggregation import aggregate
+    from report import format_statistics_table
+    from search import SearchIndex
+    from store import ArtStore
+
+    server.httpd.RequestHandlerClass.records[:] = make_records(size)
+
+    # Point the app at a fresh store and empty caches for this size
+    app_module.store = ArtStore(os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    app_module.search_index = SearchIndex(app_module.store)
+    app_module.cache.clear()
+    for artifact_cache in (app_module.report_cache, app_module.chart_artifacts.cache):
+        artifact_cache.entries.clear()
+        artifact_cache.size = 0
+    client = app_module.app.test_client()
+    gzip_headers = {'Accept-Encoding': 'gzip'}
+
+    results = [measure('sync', size, 1, app_module.sync)]
+
+    def uncached_data():
+        app_module.cache.clear()
+        expect(client.get('/api/data', headers=gzip_headers))
+
+    results.append(measure('get_data_cold', size, repeat, uncached_data))
+    results.append(measure('get_data_warm', size, repeat,
+                           lambda: expect(client.get('/api/data', headers=gzip_headers))))
+    results.append(measure('get_data_page', size, repeat,
+                           lambda: expect(client.get('/api/data?page=2&per_page=100', headers=gzip_headers))))
+    results.append(measure('get_data_ndjson_gzip', size, repeat,
+                           lambda: expect(client.get('/api/data?format=ndjson', headers=gzip_headers)).get_data()))
+    results.append(measure('get_stats_cold', size, repeat,
+                           lambda: (app_module.cache.clear(), expect(client.get('/api/stats')))))
+    results.append(measure('search', size, repeat,
+                           lambda: expect(client.get('/api/search?q=study&has_image=true&per_page=50'))))
+
+    fields = app_module.REPORT_FIELDS
+    aggregated = aggregate(app_module.store.load_table(fields))
+    results.append(measure('aggregate', size, repeat,
+                           lambda: aggregate(app_module.store.load_table(fields))))
+    results.append(measure('format_statistics_table', size, repeat,
+                           lambda: format_statistics_table(aggregated['title_stats'])))
+
+    if not skip_report:
+        charts = []
+        results.append(measure('create_charts', size, repeat,
+                               lambda: charts.append(app_module.create_charts(aggregated))))
+        results.append(measure('create_pdf_report', size, repeat,
+                               lambda: app_module.create_pdf_report(*charts[-1], aggregated)))
+
+        def uncached_report():
+            for artifact_cache in (app_module.report_cache, app_module.chart_artifacts.cache):
+                artifact_cache.entries.clear()
+                artifact_cache.size = 0
+            expect(client.get('/api/report')).get_data()
+
+        results.append(measure('get_report_cold', size, repeat, uncached_report))
+        results.append(measure('get_report_warm', size, repeat, lambda: expect(client.get('/api/report')).get_data()))
+        etag_headers = {'If-None-Match': client.get('/api/report').headers['ETag']}
+        results.append(measure('get_report_304', size, repeat,
+                               lambda: expect(client.get('/api/report', headers=etag_headers), 304)))
+        results.append(measure('get_chart', size, repeat, lambda: expect(client.get('/api/charts/pie?dpi=200')).get_data()))
+
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as file:
+        baseline = {(row['step'], row['records']): row for row in json.load(file)['results']}
+    regressions = []
+    for row in results:
+        before = baseline.get((row['step'], row['records']))
+        if not before:
+            continue
+        if before['p50_ms'] and row['p50_ms'] > before['p50_ms'] * (1 + threshold):
+            regressions.append((row['step'], row['records'], 'p50', before['p50_ms'], row['p50_ms'], 'ms'))
+        # Peak memory growth during the step; older result files lack it
+        old_rss, new_rss = before.get('rss_delta_mb'), row.get('rss_delta_mb')
+        if (old_rss is not None and new_rss is not None
+                and new_rss > old_rss * (1 + threshold) and new_rss - old_rss > MEMORY_FLOOR_MB):
+            regressions.append((row['step'], row['records'], 'rss', old_rss, new_rss, 'MB'))
+    for step, size, metric, before, after, unit in regressions:
+        print(f'REGRESSION {step} @ {size}: {metric} {before:.2f} {unit} -> {after:.2f} {unit}')
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /api/data and /api/report against a local stub.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-report', action='store_true', help='skip chart and PDF steps')
+    parser.add_argument('--output', help='results file (default: benchmarks/results-<timestamp>.json)')
+    parser.add_argument('--compare', help='previous results file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed p50 slowdown or peak memory growth before failing')
+    args = parser.parse_args()
+
+    server = StubServer([]).start()
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        'HARVARD_API_KEY': os.getenv('HARVARD_API_KEY', 'benchmark'),
+        'HARVARD_API_URL': server.url,
+        'HARVEST_RATE': '0',
+        'SYNC_INTERVAL': '0',
+        'ART_STORE_PATH': os.path.join(workdir, 'art_data.db'),
+        'IMAGE_CACHE_DIR': os.path.join(workdir, 'image_cache'),
+    })
+    import app as app_module
+
+    results = []
+    try:
+        for size in args.sizes:
+            results.extend(run_size(app_module, server, size, args.repeat, args.skip_report))
+    finally:
+        server.stop()
+
+    started = datetime.now(timezone.utc)
+    output = args.output or os.path.join('benchmarks', f"results-{started.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({
+            'timestamp': started.isoformat(),
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'results': results,
+        }, file, indent=4)
+    print(f'Wrote {output}')
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
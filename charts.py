@@ -0,0 +1,187 @@
+import hashlib
+import heapq
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')  # Headless backend; must be set before anything imports pyplot
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from aggregation import UNKNOWN_ARTIST, top_with_other
+from workers import get_process_pool
+
+# Bump when the chart styling changes so every cached artifact is redrawn
+CHART_VERSION = 1
+
+# Labels drawn per chart; the rest are folded into one 'Other' entry
+CHART_TOP_N = 20
+
+CHART_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+CHART_DPIS = (100, 200, 300)
+DEFAULT_DPI = CHART_DPIS[0]
+
+
+def snap_dpi(dpi):
+    for candidate in CHART_DPIS:
+        if dpi <= candidate:
+            return candidate
+    return CHART_DPIS[-1]
+
+
+def _clean_labels(labels):
+    return [label.strip('[]').strip() for label in labels]
+
+
+def _save(fig, fmt='png', dpi=DEFAULT_DPI):
+    # Each figure owns its own Agg canvas, so nothing is shared between
+    # concurrent renders
+    FigureCanvasAgg(fig)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi)
+    return buffer.getvalue()
+
+
+def render_pie_chart(labels, counts, fmt='png', dpi=DEFAULT_DPI, show_labels=True):
+    fig = Figure(figsize=(10, 8))
+    ax = fig.add_subplot()
+    ax.pie(counts, labels=_clean_labels(labels) if show_labels else None,
+           autopct='%1.1f%%', startangle=140, pctdistance=0.85)
+    ax.set_title('Pieces of Art with the Same Name', fontsize=20)
+    return _save(fig, fmt, dpi)
+
+
+def render_bar_chart(labels, counts, fmt='png', dpi=DEFAULT_DPI, show_labels=True):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    ax.bar(_clean_labels(labels), counts, color='skyblue')
+    ax.set_xlabel('Names of Artists', fontsize=15)
+    ax.set_ylabel('Count', fontsize=15)
+    ax.set_title('Artist Count Bar Chart', fontsize=20)
+    ax.tick_params(axis='x', labelrotation=45, labelbottom=show_labels)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    fig.tight_layout()
+    return _save(fig, fmt, dpi)
+
+
+def render_line_chart(labels, counts, fmt='png', dpi=DEFAULT_DPI, show_labels=True):
+    fig = Figure(figsize=(10, 8))
+    ax = fig.add_subplot()
+    ax.plot(_clean_labels(labels), counts, marker='o', linestyle='-', color='b')
+    ax.set_xlabel('Names of Pieces', fontsize=14)
+    ax.set_ylabel('Count', fontsize=14)
+    ax.set_title('Pieces with the Same Title', fontsize=20)
+    ax.tick_params(axis='x', labelrotation=45, labelsize=13, labelbottom=show_labels)
+    ax.tick_params(axis='y', labelsize=10)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    fig.tight_layout()
+    return _save(fig, fmt, dpi)
+
+
+def render_empty_chart(fmt='png', dpi=DEFAULT_DPI):
+    # Stand-in while there is nothing to count yet, e.g. before the first sync
+    fig = Figure(figsize=(10, 8))
+    fig.text(0.5, 0.5, 'No data yet', ha='center', va='center', fontsize=20, color='gray')
+    return _save(fig, fmt, dpi)
+
+
+# Chart name -> (renderer, dimension it plots), in report order
+CHARTS = {
+    'pie': (render_pie_chart, 'title'),
+    'bar': (render_bar_chart, 'artist'),
+    'line': (render_line_chart, 'title'),
+}
+
+
+def render_chart(name, labels, counts, fmt='png', dpi=DEFAULT_DPI, show_labels=True):
+    if not any(counts):
+        return render_empty_chart(fmt, dpi)
+    render, _ = CHARTS[name]
+    return render(labels, counts, fmt, dpi, show_labels)
+
+
+def top_counts(counts, top=CHART_TOP_N):
+    # The top (label, count) pairs of a Counter, largest first and ties by
+    # label, the same order as ArtStore.top_counts
+    return heapq.nsmallest(top, counts.items(), key=lambda pair: (-pair[1], pair[0]))
+
+
+def chart_series(name, top, total, unknown_artists=0):
+    # Labels and counts a chart draws: the top pairs plus an 'Other' entry
+    # for the long tail. The bar chart always shows the unknown artist; when
+    # it fell outside the top, its real count is taken out of 'Other'.
+    entries = top_with_other(top, total)
+    labels = [entry['label'] for entry in entries]
+    counts = [entry['count'] for entry in entries]
+    if name == 'bar' and UNKNOWN_ARTIST not in labels:
+        if unknown_artists and labels and labels[-1] == 'Other':
+            counts[-1] -= unknown_artists
+            if counts[-1] <= 0:
+                labels.pop()
+                counts.pop()
+        labels.append(UNKNOWN_ARTIST)
+        counts.append(unknown_artists)
+    return labels, counts
+
+
+def chart_version(name, labels, counts):
+    # Content hash of what a chart draws; artifacts are only re-rendered when
+    # it changes
+    payload = json.dumps([CHART_VERSION, name, labels, counts], separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ChartArtifacts:
+    # Rendered charts keyed by their content version, format and DPI, held in
+    # a size-bounded cache and drawn lazily on first request. Renders run in
+    # the executor's worker processes; concurrent requests for the same
+    # artifact share one render.
+    def __init__(self, cache, executor=None, max_workers=3):
+        self.cache = cache
+        self.executor = executor
+        self.waiters = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chart-render')
+
+    @staticmethod
+    def key(name, labels, counts, fmt='png', dpi=DEFAULT_DPI, show_labels=True):
+        # SVG output does not depend on the DPI
+        dpi = DEFAULT_DPI if fmt == 'svg' else dpi
+        variant = '' if show_labels else '-nolabels'
+        return f'{name}-{chart_version(name, labels, counts)[:32]}-{dpi}{variant}.{fmt}'
+
+    def _render(self, *args):
+        if self.executor is None:
+            return render_chart(*args)
+        return self.executor.submit(render_chart, *args).result()
+
+    def get(self, name, labels, counts, fmt='png', dpi=DEFAULT_DPI, show_labels=True):
+        args = (name, labels, counts, fmt, dpi, show_labels)
+        return self.cache.get_or_build(self.key(*args), lambda: self._render(*args))
+
+    def get_many(self, charts):
+        # Fetch or render several (name, labels, counts) charts at once
+        futures = [self.waiters.submit(self.get, *chart) for chart in charts]
+        return [future.result() for future in futures]
+
+
+def create_charts(aggregated, parallel=True, artifacts=None):
+    # Render the pie, bar and line charts into in-memory PNG buffers, reusing
+    # cached artifacts when they are given
+    charts = []
+    for name, (_, dimension) in CHARTS.items():
+        counts = aggregated[f'{dimension}_counts']
+        unknown_artists = counts.get(UNKNOWN_ARTIST, 0) if dimension == 'artist' else 0
+        charts.append((name, *chart_series(name, top_counts(counts), sum(counts.values()), unknown_artists)))
+
+    if artifacts is not None:
+        images = artifacts.get_many(charts)
+    elif parallel:
+        executor = get_process_pool()
+        futures = [executor.submit(render_chart, *chart) for chart in charts]
+        images = [future.result() for future in futures]
+    else:
+        images = [render_chart(*chart) for chart in charts]
+
+    return tuple(io.BytesIO(image) for image in images)
@@ -0,0 +1,146 @@
+import json
+from array import array
+from collections import Counter
+from itertools import islice
+
+import numpy as np
+from json.encoder import encode_basestring_ascii
+
+# Columns whose values repeat across records and are worth dictionary-encoding.
+# The remaining string fields (image_url, persistent_link) are unique per
+# object, so they are kept as plain lists.
+ENCODED_FIELDS = ('title', 'artist_name')
+
+
+def _encode(value):
+    # Same output as json.dumps for a str or None
+    return 'null' if value is None else encode_basestring_ascii(value)
+
+
+class StringColumn:
+    # Dictionary-encoded strings: each distinct value is stored once and rows
+    # hold a 32-bit code into that dictionary. Codes are assigned in order of
+    # first appearance, so grouped counts keep the records' order.
+    def __init__(self):
+        self.values = []
+        self.index = {}
+        self.codes = array('I')
+
+    def extend(self, values):
+        index = self.index
+        for value in dict.fromkeys(values):
+            if value not in index:
+                index[value] = len(self.values)
+                self.values.append(value)
+        self.codes.extend(map(index.__getitem__, values))
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def counts(self):
+        # Number of rows per distinct value, in dictionary order
+        codes = np.frombuffer(self.codes, dtype=np.uint32) if self.codes else np.zeros(0, np.uint32)
+        return np.bincount(codes, minlength=len(self.values))
+
+
+class Row:
+    # Read-only view of one record in a RecordTable
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, field):
+        return self.table.columns[field][self.row]
+
+    def get(self, field, default=None):
+        column = self.table.columns.get(field)
+        return column[self.row] if column is not None else default
+
+    def as_dict(self):
+        return {field: column[self.row] for field, column in self.table.columns.items()}
+
+
+class RecordTable:
+    # Normalized records stored column by column: object ids in a 64-bit
+    # array, titles and artist names dictionary-encoded, and everything else
+    # as plain lists. Per-record access goes through Row views.
+    #
+    # Tables are snapshots: ArtStore.load_table builds a fresh one on every
+    # call and nothing keeps it up to date afterwards. Callers only build one
+    # on a cache miss; at 100k records a full table costs about 0.2 s and
+    # 30 MB, the title and artist columns alone about 7 MB.
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.columns = {}
+        for field in self.fields:
+            if field == 'object_id':
+                self.columns[field] = array('q')
+            elif field in ENCODED_FIELDS:
+                self.columns[field] = StringColumn()
+            else:
+                self.columns[field] = []
+
+    def extend(self, rows):
+        # Append value tuples in field order, transposed a batch at a time
+        rows = list(rows)
+        if rows:
+            for column, values in zip(self.columns.values(), zip(*rows)):
+                column.extend(values)
+
+    @classmethod
+    def from_rows(cls, fields, rows, batch_size=1000):
+        # Fill a table from value tuples in field order, e.g. a DB cursor
+        table = cls(fields)
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return table
+            table.extend(batch)
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]]) if self.fields else 0
+
+    def __getitem__(self, row):
+        return Row(self, row)
+
+    def __iter__(self):
+        return (Row(self, row) for row in range(len(self)))
+
+    def value_counts(self, field, label=None):
+        # Group-by count over a dictionary-encoded column. label maps a raw
+        # value to the label it is counted under; it runs once per distinct
+        # value rather than once per record.
+        column = self.columns[field]
+        counts = Counter()
+        for value, n in zip(column.values, column.counts().tolist()):
+            if n:
+                counts[label(value) if label else value] += n
+        return counts
+
+    def iter_json(self, fields=None):
+        # JSON object per record, matching json.dumps(record) for the same
+        # dict, without building the dicts. Repeated titles and artist names
+        # are encoded once.
+        fields = self.fields if fields is None else fields
+        template = '{' + ', '.join(json.dumps(field) + ': %s' for field in fields) + '}'
+        columns = []
+        for field in fields:
+            column = self.columns[field]
+            if isinstance(column, StringColumn):
+                encoded = [_encode(value) for value in column.values]
+                columns.append(map(encoded.__getitem__, column.codes))
+            elif field == 'object_id':
+                columns.append(column)
+            else:
+                columns.append(map(_encode, column))
+        for values in zip(*columns):
+            yield template % values
+
+    def to_json(self, fields=None):
+        return '[' + ', '.join(self.iter_json(fields)) + ']'
@@ -0,0 +1,86 @@
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson'}
+MIN_SIZE = 1024
+
+
+def choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def encode_variants(data):
+    # A body in every encoding the server can send, keyed by content coding
+    # ('identity' for the plain bytes). Cached responses store these so a
+    # hit is never recompressed.
+    variants = {'identity': data}
+    if len(data) >= MIN_SIZE:
+        variants['gzip'] = compress(data, 'gzip')
+        if brotli is not None:
+            variants['br'] = compress(data, 'br')
+    return variants
+
+
+def select_variant(variants, accept_encodings):
+    # The body to send and its Content-Encoding (None for identity)
+    encoding = choose_encoding(accept_encodings)
+    if encoding in variants:
+        return variants[encoding], encoding
+    return variants['identity'], None
+
+
+def _compress_stream(chunks, encoding):
+    # Flush after every chunk so streamed records reach the client as they
+    # are produced instead of sitting in the compressor's buffer
+    if encoding == 'br':
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def compress_response(response, accept_encodings):
+    # Compress JSON and NDJSON responses with brotli or gzip, as negotiated
+    # by Accept-Encoding. Streamed responses are compressed chunk by chunk.
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    encoding = choose_encoding(accept_encodings)
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    return response
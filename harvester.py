@@ -0,0 +1,97 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import log_event, timed
+
+logger = logging.getLogger(__name__)
+
+API_ROOT = 'https://api.harvardartmuseums.org'
+PLACEHOLDER_IMAGE_URL = 'https://cdn.vectorstock.com/i/500p/82/99/no-image-available-like-missing-picture-vector-43938299.jpg'
+
+
+def normalize_record(item):
+    # Convert a raw API record into the shape the frontend expects, or None
+    # if the record should be skipped.
+    title = item.get('title')
+    image_url = item.get('primaryimageurl')
+    artist_name = None
+    persistent_link = item.get('url', 'No link available')  # Extract the persistent link
+
+    # Skip items without a title
+    if not title:
+        log_event(logger, logging.DEBUG, 'harvest.skipped', sample_rate=0.01,
+                  object_id=item.get('objectid'), reason='no title')
+        return None
+    title = title.replace('[', '').replace(']', '').strip()
+
+    # Extract artist name if available
+    if 'people' in item and len(item['people']) > 0:
+        # A missing name stays None; aggregation labels it 'Unknown Artist'
+        artist_name = item['people'][0].get('name') or None
+
+    # Ensure image_url is valid
+    if image_url:
+        # If the image URL is relative, convert it to absolute
+        if not image_url.startswith('http'):
+            image_url = f'{API_ROOT}{image_url}'
+    else:
+        # Provide a default image URL or placeholder if necessary
+        image_url = PLACEHOLDER_IMAGE_URL
+
+    return {
+        'object_id': item.get('objectid', item.get('id')),
+        'title': title,
+        'image_url': image_url,
+        'artist_name': artist_name,
+        'persistent_link': persistent_link,  # Add the persistent link
+        'lastupdate': item.get('lastupdate')
+    }
+
+
+def fetch_page(client, base_url, api_key, page, size, params=None):
+    query = dict(params or {})
+    query.update({'apikey': api_key, 'size': size, 'page': page})
+    data = client.get_json(base_url, params=query)
+
+    log_event(logger, logging.DEBUG, 'harvest.page', page=page, records=len(data.get('records', [])))
+    return data
+
+
+def harvest(client, base_url, api_key, size=100, max_workers=4, max_pages=None, params=None):
+    # Walk every page of the object endpoint and yield normalized records.
+    # The first page is fetched up front to learn info.pages; the remaining
+    # pages are fetched by a bounded worker pool and yielded in page order,
+    # with at most 2 * max_workers pages held in memory at once. Timeouts,
+    # retries and rate limiting are handled by the upstream client.
+    def fetch(page):
+        return fetch_page(client, base_url, api_key, page, size, params)
+
+    def records(data):
+        with timed('normalization'):
+            normalized = [normalize_record(item) for item in data.get('records', [])]
+        return [record for record in normalized if record is not None]
+
+    first = fetch(1)
+    pages = first.get('info', {}).get('pages', 1) or 1
+    if max_pages:
+        pages = min(pages, max_pages)
+    yield from records(first)
+
+    if pages < 2:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        next_page = 2
+        while next_page <= pages or pending:
+            while next_page <= pages and len(pending) < 2 * max_workers:
+                pending.append(pool.submit(fetch, next_page))
+                next_page += 1
+            try:
+                data = pending.popleft().result()
+            except Exception:
+                for future in pending:
+                    future.cancel()
+                raise
+            yield from records(data)
@@ -0,0 +1,210 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from PIL import Image
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; evictions are then only serialized within a process
+    fcntl = None
+
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Thumbnail widths served by /img; requests are snapped up to the nearest one
+THUMBNAIL_WIDTHS = (160, 320, 640)
+FORMATS = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+def snap_width(width):
+    for candidate in THUMBNAIL_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def make_thumbnails(original, widths=THUMBNAIL_WIDTHS, formats=tuple(FORMATS)):
+    # Decode the original once and encode every width/format pair. Runs in a
+    # worker process, so it takes and returns plain bytes.
+    image = Image.open(io.BytesIO(original))
+    image.draft('RGB', (max(widths), max(widths)))  # Let JPEG decode at reduced size
+    image = image.convert('RGB')
+    thumbnails = {}
+    for width in widths:
+        resized = image.copy()
+        resized.thumbnail((width, width * 4))
+        for fmt in formats:
+            buffer = io.BytesIO()
+            resized.save(buffer, format=fmt.upper(), quality=80)
+            thumbnails[(width, fmt)] = buffer.getvalue()
+    return thumbnails
+
+
+class DiskLRUCache:
+    # Size-bounded file cache that several processes can share. Recency lives
+    # in file mtimes, touched on every hit, so every process sees it and it
+    # survives restarts. Writers take an fcntl lock on a file in the
+    # directory, re-scan it and delete the least recently used files until
+    # the whole directory is within max_bytes, so the bound holds however many
+    # processes write to it. The scan costs one stat per cached file per
+    # write, which is small next to fetching and encoding an original.
+    LOCK_NAME = '.lock'
+
+    def __init__(self, directory, max_bytes):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.ready = False
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def get(self, name):
+        path = self.path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, name, data):
+        return self.put_many({name: data})[name]
+
+    def put_many(self, items):
+        # Write several files, then evict once for all of them
+        if not self.ready:
+            os.makedirs(self.directory, exist_ok=True)
+            self.ready = True
+        paths = {}
+        for name, data in items.items():
+            path = self.path(name)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)  # Atomic, so readers never see a partial file
+            paths[name] = path
+        self.evict(keep=paths)
+        return paths
+
+    @contextmanager
+    def _locked(self):
+        with self.lock, open(self.path(self.LOCK_NAME), 'a') as file:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            yield
+
+    def evict(self, keep=()):
+        # Delete the least recently used files, other than those in keep,
+        # until the directory fits in max_bytes
+        with self._locked():
+            files = []
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or entry.name.endswith('.tmp'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+            total = sum(size for _, _, size in files)
+            for _, name, size in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                if name in keep:
+                    continue
+                try:
+                    os.remove(self.path(name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+        return total
+
+
+class ImageUnavailable(Exception):
+    pass
+
+
+class ImageProxy:
+    # Fetches each original image once, renders all thumbnail sizes on the
+    # worker pool and serves them from the disk cache afterwards. Thumbnails
+    # are keyed by a hash of the original's URL, so objects sharing an image
+    # (such as the placeholder) share one fetch and one set of files, and
+    # concurrent misses for the same URL share one fetch. Originals that
+    # cannot be fetched or decoded are remembered for failure_ttl seconds
+    # rather than refetched on every request.
+    def __init__(self, client, cache, executor=None, failure_ttl=300):
+        self.client = client
+        self.cache = cache
+        self.executor = executor
+        self.failure_ttl = failure_ttl
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.failures = {}
+
+    @staticmethod
+    def cache_name(image_url, width, fmt):
+        digest = hashlib.sha256(image_url.encode('utf-8')).hexdigest()[:32]
+        return f'{digest}-{width}.{fmt}'
+
+    def get(self, image_url, width, fmt):
+        name = self.cache_name(image_url, width, fmt)
+        path = self.cache.get(name)
+        record_cache('image', 'hit' if path is not None else 'miss')
+        if path is not None:
+            return path
+
+        with self.lock:
+            failure = self.failures.get(image_url)
+            if failure is not None:
+                if failure[0] > time.monotonic():
+                    raise ImageUnavailable(failure[1])
+                del self.failures[image_url]
+            event = self.inflight.get(image_url)
+            leader = event is None
+            if leader:
+                event = self.inflight[image_url] = threading.Event()
+
+        if not leader:
+            event.wait()
+            path = self.cache.get(name)
+            if path is None:
+                with self.lock:
+                    failure = self.failures.get(image_url)
+                if failure is not None:
+                    raise ImageUnavailable(failure[1])
+            return path
+
+        try:
+            self._fill(image_url)
+        except (requests.RequestException, OSError, Image.DecompressionBombError) as e:
+            # OSError covers PIL's UnidentifiedImageError, e.g. when the URL
+            # answers with an HTML page instead of an image
+            message = f'{type(e).__name__}: {e}'
+            with self.lock:
+                self.failures[image_url] = (time.monotonic() + self.failure_ttl, message)
+            logger.warning('Image %s unavailable: %s', image_url, message)
+            raise ImageUnavailable(message) from e
+        finally:
+            with self.lock:
+                del self.inflight[image_url]
+            event.set()
+        return self.cache.get(name)
+
+    def _fill(self, image_url):
+        response = self.client.get(image_url)
+        if self.executor is not None:
+            thumbnails = self.executor.submit(make_thumbnails, response.content).result()
+        else:
+            thumbnails = make_thumbnails(response.content)
+        self.cache.put_many({
+            self.cache_name(image_url, width, fmt): data for (width, fmt), data in thumbnails.items()
+        })
+        logger.debug('Cached %d thumbnails for %s', len(thumbnails), image_url)
@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ReportJobs:
+    # Runs report builds on a local worker pool. Each job's status and
+    # finished artifact are kept in the shared cache backend, so with several
+    # worker processes any of them can answer the polls and the download for
+    # a job another one is running. Both expire ttl seconds after the job's
+    # last update.
+    #
+    # build(progress) must return the finished bytes; it may call
+    # progress(stage, fraction) to report how far along it is.
+    def __init__(self, build, cache, max_workers=2, ttl=3600):
+        self.build = build
+        self.cache = cache
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+
+    @staticmethod
+    def _key(job_id):
+        return f'report-job:{job_id}'
+
+    def submit(self):
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'stage': 'queued',
+            'progress': 0.0,
+            'error': None,
+            'created': time.time(),
+            'finished': None,
+        }
+        self._save(job)
+        self.executor.submit(self._run, job)
+        return dict(job)
+
+    def status(self, job_id):
+        return self.cache.get(self._key(job_id))
+
+    def result(self, job_id):
+        return self.cache.get(f'{self._key(job_id)}:result')
+
+    def _save(self, job):
+        self.cache.set(self._key(job['id']), dict(job), timeout=self.ttl)
+
+    def _update(self, job, **fields):
+        with self.lock:
+            job.update(fields)
+            self._save(job)
+
+    def _run(self, job):
+        def progress(stage, fraction):
+            self._update(job, stage=stage, progress=fraction)
+
+        self._update(job, status='running', stage='starting')
+        try:
+            result = self.build(progress)
+        except Exception as e:
+            logger.exception('Report job %s failed', job['id'])
+            self._update(job, status='failed', stage='failed', error=str(e), finished=time.time())
+        else:
+            # Store the artifact before announcing it, so a poller that sees
+            # 'done' can always download it
+            self.cache.set(f"{self._key(job['id'])}:result", result, timeout=self.ttl)
+            self._update(job, status='done', stage='done', progress=1.0, finished=time.time())
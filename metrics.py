@@ -0,0 +1,145 @@
+import bisect
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{value}"' for key, value in labels)
+    return f'{{{pairs}}}'
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    def render(self, name, labels):
+        with self.lock:
+            counts, total_sum = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {total_sum}')
+        lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    # Process-local counters and histograms rendered in the Prometheus text
+    # exposition format. Under several worker processes each worker reports
+    # its own series.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def render(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self.help:
+                    lines.append(f'# HELP {name} {self.help[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+        for (name, labels), histogram in histograms:
+            header(name, 'histogram')
+            lines.extend(histogram.render(name, labels))
+
+        # Hit ratio per cache, derived from the cache request counters
+        ratios = {}
+        for (name, labels), value in counters:
+            if name == 'app_cache_requests_total':
+                labels = dict(labels)
+                hits, total = ratios.get(labels['cache'], (0, 0))
+                if labels['result'] != 'miss':
+                    hits += value
+                ratios[labels['cache']] = (hits, total + value)
+        if ratios:
+            header('app_cache_hit_ratio', 'gauge')
+            for cache_name, (hits, total) in sorted(ratios.items()):
+                lines.append(f'app_cache_hit_ratio{{cache="{cache_name}"}} {hits / total if total else 0}')
+
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+REGISTRY.describe('app_stage_duration_seconds', 'Time spent in each processing stage.')
+REGISTRY.describe('app_request_duration_seconds', 'HTTP request latency by endpoint.')
+REGISTRY.describe('app_cache_requests_total', 'Cache lookups by cache and result.')
+REGISTRY.describe('app_cache_hit_ratio', 'Share of cache lookups that did not miss.')
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe('app_stage_duration_seconds', time.perf_counter() - start, stage=stage)
+
+
+def record_cache(cache, result):
+    # result is 'hit', 'stale' or 'miss'
+    REGISTRY.inc('app_cache_requests_total', cache=cache, result=result)
+
+
+class _Fields:
+    # key=value rendering deferred until a handler actually formats the record
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __str__(self):
+        return ' '.join(f'{key}={value!r}' for key, value in sorted(self.fields.items()))
+
+
+def log_event(logger, level, event, sample_rate=1.0, **fields):
+    # Structured, lazily formatted log line. sample_rate < 1 keeps only that
+    # fraction of events, for messages on hot paths.
+    if not logger.isEnabledFor(level):
+        return
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    logger.log(level, '%s %s', event, _Fields(fields))
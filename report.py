@@ -0,0 +1,287 @@
+import io
+from datetime import datetime
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Image, Spacer, Table, TableStyle, PageBreak
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pypdf is optional; without it the report is built as one document
+    PdfReader = PdfWriter = None
+
+from workers import get_process_pool
+
+REPORT_TITLE = "Harvard Art Data Report"
+AUTHOR_NAME = "Christina Zimmer"
+
+WIDTH, HEIGHT = letter
+MARGIN = 50
+CHART_HEIGHT = 400
+TITLE_SPACE = 20
+CHART_SPACE = 20
+ADDITIONAL_SPACE = 20
+
+# Count tables are laid out in page-sized chunks; reportlab splits one huge
+# table across pages by re-measuring the remainder each time, which grows
+# quadratically with the number of rows
+TABLE_CHUNK_ROWS = 40
+
+# Paragraph and table styles are built once and shared by every report
+STYLES = {
+    'Title': ParagraphStyle(name='Title', fontSize=14, fontName='Helvetica-Bold'),
+    'Heading': ParagraphStyle(name='Heading', fontSize=12, fontName='Helvetica-Bold'),
+    'Text': ParagraphStyle(name='Text', fontSize=12, fontName='Helvetica'),
+}
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), '#d0d0d0'),
+    ('GRID', (0, 0), (-1, -1), 1, 'black'),
+    ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONT', (0, 1), (-1, -1), 'Helvetica'),
+    ('SIZE', (0, 0), (-1, -1), 10),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+PIE_CHART_CONCLUSION = (
+    "The pie chart provides an informative and visually engaging depiction of the distribution of artwork pieces that share identical titles. By presenting the data in this way, the chart highlights the relative frequency of each title within the dataset. This representation can be particularly revealing, offering insights into patterns or trends in the way artworks are named. "
+    "For instance, a concentration of pieces with the same title might suggest that certain themes or concepts are popular among artists, indicating either a series of works centered around a common idea or a prevalent trend in artistic naming conventions. Alternatively, it could reflect a shared influence or cultural reference that resonates across multiple artists. "
+    "The chart not only helps in visualizing these patterns but also allows for a comparative analysis of how titles are distributed. By examining the sections of the pie chart, one can discern which titles are more common and which are less so, providing a clearer understanding of the dataset's composition. The specific counts for each title are detailed below, offering a quantitative breakdown that complements the visual overview provided by the chart."
+)
+
+PIE_CHART_SUMMARY = (
+    "The pie chart provides a visual representation of the distribution of artwork pieces that share identical titles. This type of chart is particularly useful for understanding patterns within a collection, revealing whether there are common themes or trends in the way artists title their works. By examining the proportions displayed, one can gain insights into the prevalence of specific titles, which might indicate a popular series, a recurring motif, or a broader trend within the art world. "
+    "The chart breaks down the frequency of each title, offering a clear view of how often each title appears in the dataset."
+)
+
+BAR_CHART_CONCLUSION = (
+"The bar chart provides a comprehensive visual representation of the distribution of artwork pieces across different artists. It effectively illustrates the number of pieces attributed to each artist, highlighting the relative abundance of works by individual artists within the dataset. By displaying this information in a bar chart format, one can easily compare the volume of artworks created by various artists, thereby identifying which artists have a more substantial presence in the collection, or the lack of their record in the Harvard Database. In the latter case, it helps showcase just how much of history is lost due to a failure of record. This chart is instrumental in understanding the distribution of artistic contributions and can reveal patterns or trends related to the popularity or prolificacy of certain artists as well as a failure on our part to properly document data. The following section enumerates the specific counts of artwork attributed to each artist, offering a clear and quantifiable view of their contributions or lack thereof."
+)
+
+BAR_CHART_SUMMARY = (
+"The bar chart offers an insightful depiction of how artwork pieces are distributed among various artists, providing a clear view of the number of works attributed to each individual. This visualization effectively highlights the relative prominence of artists within the dataset, making it easy to compare the volume of their contributions. By examining this chart, one can quickly identify artists who have a significant presence in the collection as well as those who are underrepresented or missing entirely from the Harvard Database. In cases where artists are not adequately represented, the chart underscores the potential historical gaps and the impact of incomplete record-keeping. This analysis not only sheds light on the artistic contributions of various individuals but also reveals patterns related to their popularity, prolificacy, and the challenges of maintaining comprehensive records. The subsequent section details the specific counts of artwork attributed to each artist, providing a quantitative breakdown of their contributions or the lack thereof."
+)
+
+LINE_CHART_CONCLUSION = (
+       "The line chart provides a detailed view of the distribution of artwork pieces that share identical titles, based on data from the Harvard Museum. This chart highlights the number of pieces for each title, offering a clear picture of how common or rare certain titles are within the collection. By visualizing the counts of pieces with the same title, the chart reveals patterns and trends in title prevalence, reflecting artistic preferences and naming conventions. The visualization helps to identify titles with high or low occurrences, showcasing variations in the dataset without specifying particular time periods. The subsequent section provides a detailed count for each title, offering a precise breakdown of the number of pieces associated with each title."
+)
+
+LINE_CHART_SUMMARY = (
+"The line chart visually represents the distribution of artwork pieces with identical titles within the dataset from the Harvard Museum. This chart provides an overview of how often each title appears, regardless of the specific time periods of the artworks. It highlights variations in the number of pieces with the same title, allowing for the identification of trends and patterns in title frequency. By examining this chart, one can discern which titles are more prevalent and how their distribution varies across the dataset. This summary section enumerates the exact counts for each title, offering a clear and detailed view of the title distribution."
+)
+
+
+# Report sections in document order: heading, which counts they tabulate,
+# and their fixed text
+SECTIONS = [
+    ('pie', 'Pie Chart', 'title', PIE_CHART_CONCLUSION, PIE_CHART_SUMMARY),
+    ('bar', 'Bar Chart', 'artist', BAR_CHART_CONCLUSION, BAR_CHART_SUMMARY),
+    ('line', 'Line Chart', 'title', LINE_CHART_CONCLUSION, LINE_CHART_SUMMARY),
+]
+
+
+def count_rows(counts):
+    rows = [['Title', 'Count']]
+    for title, count in counts.items():
+        clean_title = title.strip('[]').strip()
+        rows.append([clean_title, count])
+    return rows
+
+
+def count_tables(rows, chunk_rows=TABLE_CHUNK_ROWS):
+    header, body = rows[:1], rows[1:]
+    for start in range(0, max(len(body), 1), chunk_rows):
+        table = Table(header + body[start:start + chunk_rows])
+        table.setStyle(TABLE_STYLE)
+        yield table
+
+
+def format_statistics_table(stats):
+    # Round the precomputed statistics for display, showing 'N/A' where a
+    # statistic is undefined for the data
+    def display(name, digits=None):
+        value = stats.get(name)
+        if value is None or not stats.get('Count'):
+            return 'N/A'
+        return round(value, digits) if digits is not None else value
+
+    count_value = stats.get('Count', 0)
+    mean_value = display('Mean', 2)
+    mode_value = display('Mode')
+    median_value = display('Median')
+    variance_value = display('Variance', 2)
+    stdev_value = display('Standard Deviation', 2)
+    min_value = display('Min')
+    max_value = display('Max')
+
+    # Create the statistics table
+    statistics_table_data = [
+        ['Statistic', 'Value'],
+        ['Mean', mean_value],
+        ['Mode', mode_value],
+        ['Median', median_value],
+        ['Variance', variance_value],
+        ['Standard Deviation', stdev_value],
+        ['Min', min_value],
+        ['Max', max_value],
+        ['Count', count_value]
+    ]
+
+    table = Table(statistics_table_data)
+    table.setStyle(TABLE_STYLE)
+    return table
+
+
+def generate_insights(stats):
+    mean_val = stats.get('Mean', 0)
+    mode_val = stats.get('Mode', 0)
+    median_val = stats.get('Median', 0)
+    variance_val = stats.get('Variance', 0)
+    std_dev_val = stats.get('Standard Deviation', 0)
+    min_val = stats.get('Min', 0)
+    max_val = stats.get('Max', 0)
+    count_val = stats.get('Count', 0)
+
+    insights = []
+    insights.append("The statistical analysis reveals the following insights:")
+    if mean_val:
+        insights.append(f"The mean value is {mean_val:.2f}, indicating the average count.")
+    if mode_val:
+        insights.append(f"The mode value is {mode_val:.2f}, representing the most frequently occurring count.")
+    if median_val:
+        insights.append(f"The median value is {median_val:.2f}, showing the middle value in the dataset.")
+    if variance_val:
+        insights.append(f"The variance is {variance_val:.2f}, reflecting the dispersion of the counts.")
+    if std_dev_val:
+        insights.append(f"The standard deviation is {std_dev_val:.2f}, which measures the spread of the counts.")
+    if min_val and max_val:
+        insights.append(f"The minimum value is {min_val:.2f} and the maximum value is {max_val:.2f}, showing the range of counts.")
+    if count_val:
+        insights.append(f"The total number of data points is {count_val}.")
+    
+    return "\n".join(insights)
+
+
+def draw_header(canvas, report_date):
+    canvas.saveState()
+    canvas.setFont('Helvetica-Bold', 10)
+    canvas.drawString(MARGIN, HEIGHT - MARGIN + 20, REPORT_TITLE)
+    canvas.setFont('Helvetica', 10)
+    canvas.drawString(MARGIN, HEIGHT - MARGIN + 5, f"Author: {AUTHOR_NAME}")
+    canvas.drawString(MARGIN, HEIGHT - MARGIN - 10, f"Date: {report_date}")
+    canvas.restoreState()
+
+
+def draw_footer(canvas, page_number):
+    canvas.saveState()
+    canvas.setFont('Helvetica', 10)
+    canvas.drawString(WIDTH - MARGIN - 100, MARGIN - 20, f"Page {page_number}")
+    canvas.restoreState()
+
+
+def section_flowables(title, chart, conclusion_text, rows, stats, summary):
+    elements = []
+    elements.append(Paragraph(title, STYLES['Title']))
+    elements.append(Spacer(1, TITLE_SPACE))  # Space for the title
+    elements.append(Image(io.BytesIO(chart), width=WIDTH - 2 * MARGIN, height=CHART_HEIGHT))
+    elements.append(Spacer(1, CHART_SPACE))  # Space between chart and conclusion
+
+    elements.append(Paragraph("Conclusion:", STYLES['Heading']))
+    elements.append(Spacer(1, 10))
+    elements.append(Paragraph(conclusion_text, STYLES['Text']))
+    elements.append(Spacer(1, 10))
+
+    elements.extend(count_tables(rows))
+    elements.append(Spacer(1, 10))
+
+    elements.append(Paragraph("Additional Insights:", STYLES['Heading']))
+    elements.append(Spacer(1, 10))
+    elements.append(Paragraph(generate_insights(stats), STYLES['Text']))
+    elements.append(Spacer(1, ADDITIONAL_SPACE))
+
+    elements.append(format_statistics_table(stats))
+    elements.append(Spacer(1, ADDITIONAL_SPACE))
+
+    elements.append(Paragraph("Summary:", STYLES['Heading']))
+    elements.append(Spacer(1, 10))
+    elements.append(Paragraph(summary, STYLES['Text']))
+    elements.append(Spacer(1, ADDITIONAL_SPACE))
+
+    elements.append(PageBreak())
+    return elements
+
+
+def build_section(section, chart, rows, stats, report_date):
+    # Lay out one section as a standalone PDF. Runs in a worker process, so
+    # only the header is drawn here; page numbers are stamped after merging.
+    _, title, _, conclusion_text, summary = section
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    draw = lambda canvas, doc: draw_header(canvas, report_date)
+    doc.build(section_flowables(title, chart, conclusion_text, rows, stats, summary),
+              onFirstPage=draw, onLaterPages=draw)
+    return buffer.getvalue()
+
+
+def merge_sections(sections):
+    writer = PdfWriter()
+    for section in sections:
+        for page in PdfReader(io.BytesIO(section)).pages:
+            writer.add_page(page)
+
+    # Stamp the page numbers from a single overlay document
+    overlay = io.BytesIO()
+    canvas = Canvas(overlay, pagesize=letter)
+    for page_number in range(1, len(writer.pages) + 1):
+        draw_footer(canvas, page_number)
+        canvas.showPage()
+    canvas.save()
+    for page, stamp in zip(writer.pages, PdfReader(overlay).pages):
+        page.merge_page(stamp)
+
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def create_pdf_report(pie_chart, bar_chart, line_chart, aggregated, report_date=None, parallel=True):
+    report_date = report_date or datetime.now().strftime("%B %d, %Y")
+    charts = {'pie': pie_chart, 'bar': bar_chart, 'line': line_chart}
+
+    # Rows and statistics are computed once per dimension and shared by the
+    # sections that use them (the pie and line sections both tabulate titles)
+    rows = {
+        'title': count_rows(aggregated['title_counts']),
+        'artist': count_rows(aggregated['artist_counts']),
+    }
+    jobs = []
+    for section in SECTIONS:
+        kind, _, dimension, _, _ = section
+        chart = charts[kind]
+        chart = chart.getvalue() if hasattr(chart, 'getvalue') else chart
+        jobs.append((section, chart, rows[dimension], aggregated[f'{dimension}_stats']))
+
+    if parallel and PdfWriter is not None:
+        # Lay out each section in its own process and merge the results
+        executor = get_process_pool()
+        futures = [executor.submit(build_section, *job, report_date) for job in jobs]
+        pdf = merge_sections([future.result() for future in futures])
+    else:
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter)
+        elements = []
+        for (_, title, _, conclusion_text, summary), chart, section_rows, stats in jobs:
+            elements.extend(section_flowables(title, chart, conclusion_text, section_rows, stats, summary))
+
+        def draw_header_footer(canvas, doc):
+            draw_header(canvas, report_date)
+            draw_footer(canvas, doc.page)
+
+        # Build the PDF with header and footer on each page
+        doc.build(elements, onFirstPage=draw_header_footer, onLaterPages=draw_header_footer)
+        pdf = buffer.getvalue()
+
+    return io.BytesIO(pdf)
+
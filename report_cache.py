@@ -0,0 +1,91 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from metrics import record_cache
+
+
+def report_key(*parts):
+    # Hash of what identifies a report's content, such as the store version
+    # it is built from and the report date. Used as both cache key and ETag.
+    payload = json.dumps(parts, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ReportCache:
+    # In-memory LRU of finished report bytes, bounded by total size. Concurrent
+    # misses on the same key share a single build (single-flight). name labels
+    # the cache in the hit/miss metrics.
+    def __init__(self, max_bytes, name='report'):
+        self.max_bytes = max_bytes
+        self.name = name
+        self.entries = OrderedDict()
+        self.size = 0
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self._put(key, value)
+
+    def _put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self.entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get_or_build(self, key, build):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            else:
+                flight = self.inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self.inflight[key] = _Flight()
+
+        if value is not None:
+            record_cache(self.name, 'hit')
+            return value
+        record_cache(self.name, 'miss' if leader else 'coalesced')
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = build()
+            with self.lock:
+                self._put(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            flight.event.set()
@@ -0,0 +1,164 @@
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+from harvester import PLACEHOLDER_IMAGE_URL
+from metrics import timed
+
+# Columns the index needs from the store
+INDEX_FIELDS = ('title', 'image_url', 'artist_name', 'persistent_link')
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return set(TOKEN_RE.findall((text or '').casefold()))
+
+
+def title_key(title):
+    return (title or '').strip('[] ').casefold()
+
+
+def link_id(persistent_link):
+    # The id is the last path segment of the persistent link, e.g. the
+    # "12345" of https://hvrd.art/o/12345
+    return (persistent_link or '').rstrip('/').rsplit('/', 1)[-1] or None
+
+
+def image_available(image_url):
+    return bool(image_url) and image_url != PLACEHOLDER_IMAGE_URL
+
+
+class SearchIndex:
+    # In-process indexes over the store:
+    #   - an inverted index from title tokens to object ids (full-text),
+    #   - a sorted (title, object id) list for prefix search by bisection,
+    #   - artist name -> object id postings,
+    #   - persistent link id -> object id,
+    #   - the set of objects without a real image.
+    # refresh() applies only the store's changes since the last refresh, so
+    # keeping the index current costs one range scan of the change log.
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.entries = {}
+        self.tokens = defaultdict(set)
+        self.artists = defaultdict(set)
+        self.titles = []
+        self.links = {}
+        self.without_image = set()
+        self.sorted_ids = None
+
+    def refresh(self):
+        with self.lock:
+            changes = list(self.store.changes_since(self.seq, INDEX_FIELDS))
+            if not changes:
+                return 0
+            with timed('search_index'):
+                # A cold index sorts its title list once instead of inserting
+                # record by record
+                bulk = not self.entries
+                for seq, object_id, record in changes:
+                    self._remove(object_id)
+                    if record is not None:
+                        self._add(object_id, record, bulk)
+                    self.seq = seq
+                if bulk:
+                    self.titles.sort()
+                self.sorted_ids = None
+            return len(changes)
+
+    def _add(self, object_id, record, bulk=False):
+        entry = (
+            title_key(record['title']),
+            tokenize(record['title']),
+            (record['artist_name'] or '').casefold(),
+            link_id(record['persistent_link']),
+            image_available(record['image_url']),
+        )
+        key, tokens, artist, link, image = entry
+        self.entries[object_id] = entry
+        for token in tokens:
+            self.tokens[token].add(object_id)
+        self.artists[artist].add(object_id)
+        if bulk:
+            self.titles.append((key, object_id))
+        else:
+            bisect.insort(self.titles, (key, object_id))
+        if link:
+            self.links[link] = object_id
+        if not image:
+            self.without_image.add(object_id)
+
+    def _remove(self, object_id):
+        entry = self.entries.pop(object_id, None)
+        if entry is None:
+            return
+        key, tokens, artist, link, image = entry
+        for token in tokens:
+            self._discard(self.tokens, token, object_id)
+        self._discard(self.artists, artist, object_id)
+        index = bisect.bisect_left(self.titles, (key, object_id))
+        if index < len(self.titles) and self.titles[index] == (key, object_id):
+            del self.titles[index]
+        if link and self.links.get(link) == object_id:
+            del self.links[link]
+        self.without_image.discard(object_id)
+
+    @staticmethod
+    def _discard(postings, key, object_id):
+        ids = postings.get(key)
+        if ids is not None:
+            ids.discard(object_id)
+            if not ids:
+                del postings[key]
+
+    def _title_prefix(self, prefix):
+        prefix = title_key(prefix)
+        ids = set()
+        for index in range(bisect.bisect_left(self.titles, (prefix,)), len(self.titles)):
+            key, object_id = self.titles[index]
+            if not key.startswith(prefix):
+                break
+            ids.add(object_id)
+        return ids
+
+    def search(self, text=None, title=None, artist=None, has_image=None, link=None):
+        # Object ids matching every given filter, in object id order. text
+        # matches all of its tokens anywhere in the title; title is a
+        # case-insensitive prefix; artist is a case-insensitive exact name.
+        self.refresh()
+        with self.lock, timed('search'):
+            candidates = []
+            if text is not None:
+                tokens = tokenize(text)
+                candidates.extend(self.tokens.get(token, set()) for token in tokens)
+                if not tokens:
+                    candidates.append(set())
+            if title is not None:
+                candidates.append(self._title_prefix(title))
+            if artist is not None:
+                candidates.append(self.artists.get(artist.strip().casefold(), set()))
+            if link is not None:
+                object_id = self.links.get(link_id(link))
+                candidates.append({object_id} if object_id is not None else set())
+
+            if candidates:
+                # Intersect starting from the smallest posting list
+                candidates.sort(key=len)
+                ids = set(candidates[0])
+                for other in candidates[1:]:
+                    ids &= other
+                    if not ids:
+                        break
+                if has_image is not None:
+                    ids = {object_id for object_id in ids if (object_id not in self.without_image) == has_image}
+                return sorted(ids)
+
+            if self.sorted_ids is None:
+                self.sorted_ids = sorted(self.entries)
+            if has_image is None:
+                return self.sorted_ids
+            return [object_id for object_id in self.sorted_ids if (object_id not in self.without_image) == has_image]
@@ -8,60 +8,42 @@ let chartsVisible = true; // Tracks whether charts are visible or hidden
 let labelsVisible = true; // Track whether labels are visible
 let artVisible = true; // Track whether art is visible
 
-const chartOptions = {
-    responsive: true,
-    maintainAspectRatio: false, // Allow the chart to fill the container
-    plugins: {
-        legend: {
-            position: 'top',
-            onClick: (e, legendItem, legend) => {
-                // Use built-in Chart.js functionality to handle legend click
-                const index = legendItem.datasetIndex;
-                const chart = legend.chart;
-                const meta = chart.getDatasetMeta(index);
+async function fetchRecords(url, onBatch) {
+    // Read an NDJSON response line by line, handing each batch of parsed
+    // records to onBatch as soon as it arrives
+    const response = await fetch(url, { headers: { Accept: 'application/x-ndjson' } });
+    if (!response.ok) {
+        const body = await response.json();
+        throw new Error(body.error || response.statusText);
+    }
 
-                meta.hidden = meta.hidden === null ? !chart.data.datasets[index].hidden : null;
-                chart.update();
-            }
-        },
-        tooltip: {
-            callbacks: {
-                label: function (context) {
-                    let label = context.label || '';
-                    if (label) {
-                        label += ': ';
-                    }
-                    if (context.parsed !== null) {
-                        label += context.parsed + ' items';
-                    }
-                    return label;
-                }
-            }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffered.split('\n');
+        buffered = done ? '' : lines.pop();
+        const batch = lines.filter(line => line.trim()).map(line => JSON.parse(line));
+        if (batch.length) {
+            onBatch(batch);
+        }
+        if (done) {
+            break;
         }
     }
-};
+}
 
 async function loadData() {
     try {
-        const response = await fetch('/api/data');
-        const data = await response.json();
-
-        if (data.error) {
-            console.error('Error fetching data:', data.error);
-            return;
-        }
-
-        // Process and display pie chart
-        displayPieChart(data);
-
-        // Process and display the bar chart
-        displayBarChart(data);
+        // Charts are rendered and cached on the server
+        displayCharts();
 
-        // Process and display line chart
-        displayLineChart(data);
-
-        // Display art data
-        displayArt(data);
+        // Stream only the fields the art grid uses and render art as it arrives
+        clearArt();
+        await fetchRecords('/api/data?format=ndjson&fields=object_id,title', displayArt);
 
         dataLoaded = true; // Mark data as loaded
         if (!chartsVisible) {
@@ -72,136 +54,31 @@ async function loadData() {
         }
 
     } catch (error) {
-        console.error('Error:', error);
+        console.error('Error fetching data:', error);
     }
 }
 
-function displayPieChart(data) {
-    const titles = data.map(item => item.title || 'Unknown Title');
-    const titleCounts = titles.reduce((acc, title) => {
-        acc[title] = (acc[title] || 0) + 1;
-        return acc;
-    }, {});
-
-    const labels = Object.keys(titleCounts);
-    const counts = Object.values(titleCounts);
-
-    new Chart(document.getElementById('pieChart').getContext('2d'), {
-        type: 'pie',
-        data: {
-            labels: labels,
-            datasets: [{
-                data: counts,
-                backgroundColor: generateColors(labels.length),
-                borderColor: 'rgba(0, 0, 0, 0.1)',
-                borderWidth: 1
-            }]
-        },
-        options: {
-            ...chartOptions,
-            plugins: {
-                ...chartOptions.plugins,
-                legend: {
-                    ...chartOptions.plugins.legend,
-                    display: labelsVisible
-                }
-            }
-        }
-    });
+function displayCharts() {
+    displayChart('pieChart', 'pie');
+    displayChart('barChart', 'bar');
+    displayChart('lineChart', 'line');
 }
 
-function displayBarChart(data) {
-    // Collect artists and handle 'Unknown Artist'
-    const artists = data.map(item => item.artist_name || 'Unknown Artist');
-    const artistCounts = artists.reduce((acc, artist) => {
-        acc[artist] = (acc[artist] || 0) + 1;
-        return acc;
-    }, {});
-
-    // Ensure 'Unknown Artist' is included
-    if (!artistCounts['Unknown Artist']) {
-        artistCounts['Unknown Artist'] = 0;
-    }
-
-    const labels = Object.keys(artistCounts);
-    const counts = Object.values(artistCounts);
-
-    new Chart(document.getElementById('barChart').getContext('2d'), {
-        type: 'bar',
-        data: {
-            labels: labels,
-            datasets: [{
-                label: 'Number of Artworks by Artist',
-                data: counts,
-                backgroundColor: generateColors(labels.length),
-                borderColor: 'rgba(0, 0, 0, 0.1)',
-                borderWidth: 1
-            }]
-        },
-        options: {
-            ...chartOptions,
-            scales: {
-                y: {
-                    beginAtZero: true
-                }
-            }
-        }
-    });
+function displayChart(elementId, name) {
+    // Sharper images on high-density screens; the server snaps the DPI
+    const url = `/api/charts/${name}?labels=${labelsVisible ? 1 : 0}`;
+    const image = document.getElementById(elementId);
+    image.src = url;
+    image.srcset = `${url} 1x, ${url}&dpi=200 2x`;
 }
 
-function displayLineChart(data) {
-    const titles = data.map(item => item.title || 'Unknown Title');
-    const titleCounts = titles.reduce((acc, title) => {
-        acc[title] = (acc[title] || 0) + 1;
-        return acc;
-    }, {});
-
-    const labels = Object.keys(titleCounts);
-    const counts = Object.values(titleCounts);
-
-    window.lineChart = new Chart(document.getElementById('lineChart').getContext('2d'), {
-        type: 'line',
-        data: {
-            labels: labels,
-            datasets: [{
-                label: 'Number of Objects by Title',
-                data: counts,
-                fill: false,
-                borderColor: 'rgba(75, 192, 192, 1)',
-                tension: 0.1
-            }]
-        },
-        options: {
-            ...chartOptions,
-            plugins: {
-                ...chartOptions.plugins,
-                legend: {
-                    ...chartOptions.plugins.legend,
-                    display: labelsVisible
-                }
-            },
-            scales: {
-                x: {
-                    ticks: {
-                        display: labelsVisible,
-                        autoSkip: !labelsVisible,
-                        maxRotation: 90,
-                        minRotation: 45
-                    }
-                },
-                y: {
-                    ticks: {
-                        display: labelsVisible
-                    }
-                }
-            }
-        }
-    });
+function clearArt() {
+    document.getElementById('artContainer').innerHTML = ''; // Clear existing content
 }
 
 function displayArt(data) {
     const artContainer = document.getElementById('artContainer');
-    artContainer.innerHTML = ''; // Clear existing content
+    const fragment = document.createDocumentFragment();
 
     data.forEach(item => {
         const artItem = document.createElement('div');
@@ -210,23 +87,19 @@ function displayArt(data) {
         const title = document.createElement('h2');
         title.textContent = item.title || 'Untitled';
 
+        // Thumbnails come from the local image proxy, sized for the grid
         const image = document.createElement('img');
-        image.src = item.image_url || 'path_to_placeholder_image';
+        image.src = `/img/${item.object_id}?w=320`;
+        image.srcset = `/img/${item.object_id}?w=320 1x, /img/${item.object_id}?w=640 2x`;
+        image.loading = 'lazy';
         image.alt = item.title || 'Art Image';
 
         artItem.appendChild(title);
         artItem.appendChild(image);
-        artContainer.appendChild(artItem);
+        fragment.appendChild(artItem);
     });
-}
 
-function generateColors(count) {
-    const colors = [];
-    for (let i = 0; i < count; i++) {
-        const hue = Math.floor(Math.random() * 360);
-        colors.push(`hsl(${hue}, 70%, 70%)`);
-    }
-    return colors;
+    artContainer.appendChild(fragment);
 }
 
 function toggleDataVisibility() {
@@ -246,20 +119,9 @@ function toggleDataVisibility() {
 function toggleLabelsVisibility() {
     labelsVisible = !labelsVisible;
 
-    // Update the line chart with updated options
-    if (window.lineChart) {
-        lineChart.options.plugins.legend.display = labelsVisible;
-        lineChart.options.scales.x.ticks.display = labelsVisible;
-        lineChart.options.scales.x.ticks.autoSkip = !labelsVisible;
-        lineChart.options.scales.y.ticks.display = labelsVisible; // Optionally toggle y-axis labels visibility
-        lineChart.update();
-    }
-
-    // Update the pie chart with updated options
-    const pieChart = Chart.getChart('pieChart');
-    if (pieChart) {
-        pieChart.options.plugins.legend.display = labelsVisible;
-        pieChart.update();
+    // Swap in the chart variants with or without title/artist labels
+    if (dataLoaded) {
+        displayCharts();
     }
 
     // Update button text based on current state
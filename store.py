@@ -0,0 +1,393 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; syncs are then not coordinated between processes
+    fcntl = None
+
+from columns import RecordTable
+from harvester import harvest
+
+logger = logging.getLogger(__name__)
+
+# Fields returned to the API, in column order
+RECORD_FIELDS = ('object_id', 'title', 'image_url', 'artist_name', 'persistent_link')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    object_id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    image_url TEXT,
+    artist_name TEXT,
+    persistent_link TEXT,
+    lastupdate TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_objects_title ON objects (title);
+CREATE INDEX IF NOT EXISTS idx_objects_artist_name ON objects (artist_name);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- Running title and artist counts, kept in step with objects by the
+-- triggers below so statistics never need a pass over the collection
+CREATE TABLE IF NOT EXISTS title_counts (
+    label TEXT PRIMARY KEY,
+    n INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_title_counts_n ON title_counts (n);
+CREATE TABLE IF NOT EXISTS artist_counts (
+    label TEXT PRIMARY KEY,
+    n INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artist_counts_n ON artist_counts (n);
+
+CREATE TRIGGER IF NOT EXISTS objects_counts_insert AFTER INSERT ON objects BEGIN
+    INSERT INTO title_counts (label, n) VALUES (new.title, 1)
+        ON CONFLICT (label) DO UPDATE SET n = n + 1;
+    INSERT INTO artist_counts (label, n) VALUES (COALESCE(NULLIF(new.artist_name, ''), 'Unknown Artist'), 1)
+        ON CONFLICT (label) DO UPDATE SET n = n + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS objects_counts_delete AFTER DELETE ON objects BEGIN
+    UPDATE title_counts SET n = n - 1 WHERE label = old.title;
+    UPDATE artist_counts SET n = n - 1 WHERE label = COALESCE(NULLIF(old.artist_name, ''), 'Unknown Artist');
+    DELETE FROM title_counts WHERE n <= 0;
+    DELETE FROM artist_counts WHERE n <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS objects_counts_update AFTER UPDATE OF title, artist_name ON objects BEGIN
+    UPDATE title_counts SET n = n - 1 WHERE label = old.title;
+    UPDATE artist_counts SET n = n - 1 WHERE label = COALESCE(NULLIF(old.artist_name, ''), 'Unknown Artist');
+    INSERT INTO title_counts (label, n) VALUES (new.title, 1)
+        ON CONFLICT (label) DO UPDATE SET n = n + 1;
+    INSERT INTO artist_counts (label, n) VALUES (COALESCE(NULLIF(new.artist_name, ''), 'Unknown Artist'), 1)
+        ON CONFLICT (label) DO UPDATE SET n = n + 1;
+    DELETE FROM title_counts WHERE n <= 0;
+    DELETE FROM artist_counts WHERE n <= 0;
+END;
+
+-- Change log for incremental consumers such as the search index: one row per
+-- object, moved to a new, higher seq every time the object is written or
+-- deleted, so "everything since seq N" is a single range scan
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    object_id INTEGER NOT NULL UNIQUE
+);
+
+CREATE TRIGGER IF NOT EXISTS objects_changes_insert AFTER INSERT ON objects BEGIN
+    DELETE FROM changes WHERE object_id = new.object_id;
+    INSERT INTO changes (object_id) VALUES (new.object_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS objects_changes_update AFTER UPDATE ON objects BEGIN
+    DELETE FROM changes WHERE object_id = new.object_id;
+    INSERT INTO changes (object_id) VALUES (new.object_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS objects_changes_delete AFTER DELETE ON objects BEGIN
+    DELETE FROM changes WHERE object_id = old.object_id;
+    INSERT INTO changes (object_id) VALUES (old.object_id);
+END;
+"""
+
+# Count tables that back the running statistics, by dimension
+COUNT_TABLES = {'title': 'title_counts', 'artist': 'artist_counts'}
+
+UPSERT = """
+INSERT INTO objects (object_id, title, image_url, artist_name, persistent_link, lastupdate)
+VALUES (:object_id, :title, :image_url, :artist_name, :persistent_link, :lastupdate)
+ON CONFLICT (object_id) DO UPDATE SET
+    title = excluded.title,
+    image_url = excluded.image_url,
+    artist_name = excluded.artist_name,
+    persistent_link = excluded.persistent_link,
+    lastupdate = excluded.lastupdate
+-- Unchanged records are left alone, so re-syncing them neither fires the
+-- triggers nor moves the change log
+WHERE objects.title IS NOT excluded.title
+    OR objects.image_url IS NOT excluded.image_url
+    OR objects.artist_name IS NOT excluded.artist_name
+    OR objects.persistent_link IS NOT excluded.persistent_link
+    OR objects.lastupdate IS NOT excluded.lastupdate
+"""
+
+
+class ArtStore:
+    # SQLite-backed store of normalized art records. Each thread gets its own
+    # connection; WAL mode lets request threads read while the sync job writes.
+    # The file is opened, and the schema and backfills applied, on first use,
+    # so constructing a store (e.g. in a worker process that re-imports the
+    # app) touches nothing.
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.ready = False
+        self.ready_lock = threading.Lock()
+        self.store_id = None
+
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+            if not self.ready:
+                self.prepare()
+        return conn
+
+    def prepare(self):
+        with self.ready_lock:
+            if self.ready:
+                return
+            with self.connect() as conn:
+                conn.executescript(SCHEMA)
+            self.backfill_counts()
+            self.backfill_changes()
+            # Older harvests stored this placeholder instead of None, which
+            # counted as an artist of its own
+            with self.connect() as conn:
+                conn.execute("UPDATE objects SET artist_name = NULL WHERE artist_name = 'Unknown artist'")
+            # Random id of this database file, so versions of a recreated
+            # store never repeat an old one
+            with self.connect() as conn:
+                conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+            self.store_id = self.get_meta('store_id')
+            self.ready = True
+
+    @contextmanager
+    def snapshot(self):
+        # Reads on this thread inside the block all see the same state of the
+        # store, however many writes the sync job commits meanwhile
+        conn = self.connect()
+        if conn.in_transaction:
+            yield
+            return
+        conn.execute('BEGIN')
+        try:
+            yield
+        finally:
+            conn.execute('COMMIT')
+
+    def upsert_many(self, records):
+        rows = [record for record in records if record.get('object_id') is not None]
+        with self.connect() as conn:
+            conn.executemany(UPSERT, rows)
+        return len(rows)
+
+    def iter_records(self, fields=RECORD_FIELDS, batch_size=1000):
+        cursor = self.connect().execute(
+            f"SELECT {', '.join(fields)} FROM objects ORDER BY object_id"
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(fields, row))
+
+    def load_table(self, fields=RECORD_FIELDS):
+        # The whole collection as a columnar RecordTable, filled straight
+        # from the cursor without building a dict per record. Each call is a
+        # full scan into a new table.
+        cursor = self.connect().execute(
+            f"SELECT {', '.join(fields)} FROM objects ORDER BY object_id"
+        )
+        return RecordTable.from_rows(fields, cursor)
+
+    def get(self, object_id, fields=RECORD_FIELDS):
+        row = self.connect().execute(
+            f"SELECT {', '.join(fields)} FROM objects WHERE object_id = ?", (object_id,)
+        ).fetchone()
+        return dict(zip(fields, row)) if row else None
+
+    def page(self, fields=RECORD_FIELDS, limit=100, offset=0, after=None):
+        # One page in object id order, either by offset or, when after is
+        # given, by keyset (object_id > after), which stays cheap however deep
+        # the page is. Returns the records and the last object id on the page.
+        query = f"SELECT object_id, {', '.join(fields)} FROM objects"
+        params = []
+        if after is not None:
+            query += ' WHERE object_id > ?'
+            params.append(after)
+        query += ' ORDER BY object_id LIMIT ? OFFSET ?'
+        params += [limit, offset]
+        rows = self.connect().execute(query, params).fetchall()
+        records = [dict(zip(fields, row[1:])) for row in rows]
+        return records, (rows[-1][0] if rows else None)
+
+    def backfill_counts(self):
+        # Stores created before the count tables existed have objects but no
+        # counts; rebuild them once from the objects table
+        conn = self.connect()
+        if conn.execute('SELECT 1 FROM title_counts LIMIT 1').fetchone():
+            return
+        if not conn.execute('SELECT 1 FROM objects LIMIT 1').fetchone():
+            return
+        with conn:
+            conn.execute('INSERT INTO title_counts (label, n) SELECT title, COUNT(*) FROM objects GROUP BY title')
+            conn.execute(
+                "INSERT INTO artist_counts (label, n) "
+                "SELECT COALESCE(NULLIF(artist_name, ''), 'Unknown Artist') AS label, COUNT(*) "
+                "FROM objects GROUP BY label"
+            )
+
+    def backfill_changes(self):
+        # Likewise for stores created before the change log existed
+        conn = self.connect()
+        if conn.execute('SELECT 1 FROM changes LIMIT 1').fetchone():
+            return
+        with conn:
+            conn.execute('INSERT INTO changes (object_id) SELECT object_id FROM objects ORDER BY object_id')
+
+    def changes_since(self, seq, fields=RECORD_FIELDS):
+        # Objects written or deleted after seq, oldest change first, as
+        # (seq, object_id, record) with record None for deleted objects
+        columns = ', '.join(f'o.{field}' for field in fields)
+        rows = self.connect().execute(
+            f'SELECT c.seq, c.object_id, o.object_id IS NOT NULL, {columns} '
+            'FROM changes c LEFT JOIN objects o ON o.object_id = c.object_id '
+            'WHERE c.seq > ? ORDER BY c.seq',
+            (seq,),
+        )
+        for row in rows:
+            yield row[0], row[1], (dict(zip(fields, row[3:])) if row[2] else None)
+
+    def get_many(self, object_ids, fields=RECORD_FIELDS):
+        # Records for the given ids in object id order; the ids go in as one
+        # JSON array so any number of them fits in a single parameter
+        rows = self.connect().execute(
+            f"SELECT {', '.join(fields)} FROM objects "
+            'WHERE object_id IN (SELECT value FROM json_each(?)) ORDER BY object_id',
+            (json.dumps(list(object_ids)),),
+        )
+        return [dict(zip(fields, row)) for row in rows]
+
+    def top_counts(self, dimension, limit):
+        table = COUNT_TABLES[dimension]
+        return self.connect().execute(
+            f'SELECT label, n FROM {table} ORDER BY n DESC, label LIMIT ?', (limit,)
+        ).fetchall()
+
+    def label_count(self, dimension, label):
+        table = COUNT_TABLES[dimension]
+        row = self.connect().execute(f'SELECT n FROM {table} WHERE label = ?', (label,)).fetchone()
+        return row[0] if row else 0
+
+    def count_frequencies(self, dimension):
+        # How many labels occur n times, for each n
+        table = COUNT_TABLES[dimension]
+        return dict(self.connect().execute(f'SELECT n, COUNT(*) FROM {table} GROUP BY n ORDER BY n'))
+
+    def version(self):
+        # Store id and sequence number of the latest change. Every write or
+        # delete moves it, so it identifies the collection's current contents.
+        seq = self.connect().execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+        return f'{self.store_id}-{seq}'
+
+    def count(self):
+        return self.connect().execute('SELECT COUNT(*) FROM objects').fetchone()[0]
+
+    def get_meta(self, key, default=None):
+        row = self.connect().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.connect() as conn:
+            conn.execute(
+                'INSERT INTO meta (key, value) VALUES (?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+                (key, value),
+            )
+
+
+@contextmanager
+def sync_lock(store_path):
+    # Non-blocking advisory lock on a file next to the store, so only one
+    # process (e.g. one of several gunicorn workers) harvests at a time. The
+    # lock is released when its holder exits, however it exits. Yields
+    # whether it was acquired.
+    if fcntl is None:
+        yield True
+        return
+    with open(f'{store_path}.sync-lock', 'a') as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def sync_store(store, client, base_url, api_key, batch_size=500, min_interval=0, **harvest_kwargs):
+    # Sync the store unless another process is already syncing it or the last
+    # sync finished less than min_interval seconds ago. Returns the number of
+    # records upserted.
+    with sync_lock(store.path) as acquired:
+        if not acquired:
+            logger.info('Skipping sync: another process is syncing %s', store.path)
+            return 0
+        synced_at = float(store.get_meta('synced_at', 0))
+        if time.time() - synced_at < min_interval:
+            logger.info('Skipping sync: %s was synced %.0fs ago', store.path, time.time() - synced_at)
+            return 0
+        total = _sync_changes(store, client, base_url, api_key, batch_size, **harvest_kwargs)
+        store.set_meta('synced_at', time.time())
+        return total
+
+
+def _sync_changes(store, client, base_url, api_key, batch_size, **harvest_kwargs):
+    # Upsert every record changed since the stored lastupdate watermark. The
+    # watermark only advances once the whole harvest has succeeded, so a
+    # failed sync is retried from the same point next time.
+    watermark = store.get_meta('lastupdate')
+    params = {'sort': 'lastupdate', 'sortorder': 'asc'}
+    if watermark:
+        # Compare on the date only; re-upserting a day's worth of records is
+        # harmless and avoids escaping the timestamp in the query string
+        params['q'] = f'lastupdate:>={watermark[:10]}'
+
+    newest = watermark
+    total = 0
+    batch = []
+    for record in harvest(client, base_url, api_key, params=params, **harvest_kwargs):
+        lastupdate = record.get('lastupdate')
+        if lastupdate and (newest is None or lastupdate > newest):
+            newest = lastupdate
+        batch.append(record)
+        if len(batch) >= batch_size:
+            total += store.upsert_many(batch)
+            batch = []
+    total += store.upsert_many(batch)
+
+    if newest:
+        store.set_meta('lastupdate', newest)
+    logger.info('Synced %d records (watermark %s -> %s)', total, watermark, newest)
+    return total
+
+
+def start_background_sync(job, interval):
+    # Run job immediately and then every interval seconds on a daemon thread
+    stop = threading.Event()
+
+    def run():
+        while not stop.is_set():
+            try:
+                job()
+            except Exception:
+                logger.exception('Background sync failed')
+            stop.wait(interval)
+
+    thread = threading.Thread(target=run, name='art-store-sync', daemon=True)
+    thread.start()
+    return stop
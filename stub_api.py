@@ -0,0 +1,176 @@
+# Local stand-in for the Harvard Art Museums /object endpoint. It serves
+# synthetic records in the same records/info envelope so the harvester can
+# be exercised offline:
+#
+#     python stub_api.py --records 1000 --port 8001
+#     HARVARD_API_URL=http://127.0.0.1:8001/object python app.py
+#
+# With --local-images the records' primary images are also served by the
+# stub (/images/<id>.jpg), so the image proxy can be exercised offline too.
+import argparse
+import io
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TITLES = ['Untitled', 'Portrait of a Woman', 'Landscape', 'Still Life', 'Bowl', 'Vase',
+          'Head of a Man', 'Study', 'Fragment', 'Cup', 'Coin', 'Seal', 'Figure']
+ARTISTS = ['Unidentified Artist', 'Rembrandt van Rijn', 'Katsushika Hokusai',
+           'Kathe Kollwitz', 'Paul Cezanne', 'Vincent van Gogh', 'Mary Cassatt']
+
+
+def make_image(object_id, size=(1200, 900)):
+    from PIL import Image
+    color = ((object_id * 37) % 256, (object_id * 91) % 256, (object_id * 53) % 256)
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def make_records(count, seed=0, image_base='https://nrs.harvard.edu/urn-3:HUAM:'):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        object_id = 100000 + i
+        record = {
+            'objectid': object_id,
+            'id': object_id,
+            'title': f'{rng.choice(TITLES)} {rng.randint(1, max(1, count // 20))}',
+            'url': f'https://www.harvardartmuseums.org/collections/object/{object_id}',
+            'lastupdate': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T04:00:00-0400',
+        }
+        if rng.random() < 0.7:
+            record['people'] = [{'name': rng.choice(ARTISTS), 'role': 'Artist'}]
+        if rng.random() < 0.8:
+            record['primaryimageurl'] = f'{image_base}{object_id}'
+        records.append(record)
+    return records
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    records = []
+    # Failure injection for client tests: every /object request is logged in
+    # requests and delayed by delay seconds, and the queued (status,
+    # Retry-After) pairs in failures answer the next requests
+    requests = []
+    failures = []
+    delay = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith('/images/'):
+            self.send_image(url.path[len('/images/'):])
+            return
+        if url.path.rstrip('/') != '/object':
+            self.send_error(404)
+            return
+        self.requests.append(self.path)
+        if self.delay:
+            time.sleep(self.delay)
+        try:
+            status, retry_after = self.failures.pop(0)
+        except IndexError:
+            pass
+        else:
+            self.send_response(status)
+            if retry_after is not None:
+                self.send_header('Retry-After', str(retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        query = parse_qs(url.query)
+        size = int(query.get('size', ['10'])[0])
+        page = int(query.get('page', ['1'])[0])
+        records = self.records
+        # Support the incremental sync query: q=lastupdate:>=YYYY-MM-DD
+        q = query.get('q', [''])[0]
+        if q.startswith('lastupdate:>='):
+            since = q[len('lastupdate:>='):]
+            records = [record for record in records if record['lastupdate'][:len(since)] >= since]
+        if query.get('sort', [''])[0] == 'lastupdate':
+            records = sorted(records, key=lambda record: record['lastupdate'])
+        start = (page - 1) * size
+        body = json.dumps({
+            'info': {
+                'totalrecordsperquery': size,
+                'totalrecords': len(records),
+                'pages': max(1, math.ceil(len(records) / size)),
+                'page': page,
+            },
+            'records': records[start:start + size],
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_image(self, name):
+        object_id = name.split('.')[0]
+        if not object_id.isdigit():
+            self.send_error(404)
+            return
+        body = make_image(int(object_id))
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    # Runs the stub on a background thread; usable as a context manager.
+    def __init__(self, records, host='127.0.0.1', port=0):
+        handler = type('BoundStubHandler', (StubHandler,), {'records': records, 'requests': [], 'failures': []})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.httpd.RequestHandlerClass.requests
+
+    def fail_next(self, *statuses, retry_after=None):
+        # Answer the next len(statuses) /object requests with these statuses
+        self.httpd.RequestHandlerClass.failures.extend((status, retry_after) for status in statuses)
+
+    def set_delay(self, seconds):
+        self.httpd.RequestHandlerClass.delay = seconds
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/object'
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve synthetic Harvard API records.')
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--local-images', action='store_true', help='serve primary images from the stub')
+    args = parser.parse_args()
+    image_base = f'http://127.0.0.1:{args.port}/images/' if args.local_images else 'https://nrs.harvard.edu/urn-3:HUAM:'
+    server = StubServer(make_records(args.records, args.seed, image_base), port=args.port)
+    print(f'Serving {args.records} records at {server.url}')
+    server.httpd.serve_forever()
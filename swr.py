@@ -0,0 +1,46 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='swr-refresh')
+
+
+def stale_while_revalidate(cache, key, compute, fresh_for, stale_for, lock_timeout=60):
+    # Serve key from cache, computing it only on a cold miss. Entries older
+    # than fresh_for seconds are still served for up to stale_for more seconds
+    # while one background refresh runs. The refresh lock is taken with
+    # cache.add, which is atomic on shared backends such as Redis, so only one
+    # worker process refreshes a given key at a time.
+    def store(value):
+        cache.set(key, (time.time(), value), timeout=fresh_for + stale_for)
+
+    def refresh():
+        try:
+            store(compute())
+        except Exception:
+            logger.exception('Background refresh of %s failed', key)
+        finally:
+            cache.delete(f'{key}:refresh-lock')
+
+    # Cache hits are reported per key family (the part before the first ':')
+    name = key.split(':', 1)[0]
+    entry = cache.get(key)
+    if entry is None:
+        record_cache(name, 'miss')
+        value = compute()
+        store(value)
+        return value
+
+    created, value = entry
+    if time.time() - created <= fresh_for:
+        record_cache(name, 'hit')
+        return value
+
+    record_cache(name, 'stale')
+    if cache.add(f'{key}:refresh-lock', 1, timeout=lock_timeout):
+        _refresher.submit(refresh)
+    return value
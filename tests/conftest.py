@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_api import StubServer, make_records  # noqa: E402
+from store import ArtStore  # noqa: E402
+from upstream import UpstreamClient  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtStore(str(tmp_path / 'art_data.db'))
+
+
+@pytest.fixture
+def stub():
+    # Stub API serving 250 synthetic records; tests may replace server.records
+    with StubServer(make_records(250)) as server:
+        server.records = server.httpd.RequestHandlerClass.records
+        yield server
+
+
+@pytest.fixture
+def app_module(tmp_path_factory, monkeypatch):
+    # The Flask app pointed at a fresh, empty store with cold caches. The
+    # module is imported once; its settings come from the environment.
+    workdir = tmp_path_factory.mktemp('app')
+    for key, value in {
+        'HARVARD_API_KEY': 'test',
+        'SYNC_INTERVAL': '0',
+        'ART_STORE_PATH': str(workdir / 'art_data.db'),
+        'IMAGE_CACHE_DIR': str(workdir / 'image_cache'),
+    }.items():
+        os.environ.setdefault(key, value)
+    import app
+    from search import SearchIndex
+
+    store = ArtStore(str(workdir / 'test.db'))
+    monkeypatch.setattr(app, 'store', store)
+    monkeypatch.setattr(app, 'search_index', SearchIndex(store))
+    app.cache.clear()
+    for artifact_cache in (app.report_cache, app.chart_artifacts.cache):
+        artifact_cache.entries.clear()
+        artifact_cache.size = 0
+    return app
+
+
+@pytest.fixture
+def client():
+    return UpstreamClient(retries=0)
+
+
+def record(object_id, title='Untitled', artist_name=None, image_url=None, lastupdate='2024-01-01T00:00:00-0400'):
+    # A normalized record as the harvester produces it
+    return {
+        'object_id': object_id,
+        'title': title,
+        'image_url': image_url,
+        'artist_name': artist_name,
+        'persistent_link': f'https://hvrd.art/o/{object_id}',
+        'lastupdate': lastupdate,
+    }
@@ -0,0 +1,75 @@
+import random
+import statistics
+from collections import Counter
+
+import pytest
+
+from aggregation import UNKNOWN_ARTIST, aggregate, summarize, summarize_frequencies, top_with_other
+from columns import RecordTable
+from conftest import record
+from harvester import normalize_record
+
+
+def expected_stats(values):
+    return {
+        'Mean': statistics.mean(values),
+        'Mode': statistics.mode(values),
+        'Median': statistics.median(values),
+        'Variance': statistics.variance(values) if len(values) > 1 else None,
+        'Standard Deviation': statistics.stdev(values) if len(values) > 1 else None,
+        'Min': min(values),
+        'Max': max(values),
+        'Count': len(values),
+    }
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_summarize_matches_statistics(seed):
+    rng = random.Random(seed)
+    counts = Counter({f'label {i}': rng.choice([1, 1, 2, 3, rng.randint(1, 500)])
+                      for i in range(rng.randint(1, 200))})
+    stats = summarize(counts)
+    for name, value in expected_stats(list(counts.values())).items():
+        assert stats[name] == pytest.approx(value), name
+
+
+def test_summarize_frequencies_edge_cases():
+    assert summarize_frequencies({}) == {
+        'Mean': None, 'Mode': None, 'Median': None, 'Variance': None,
+        'Standard Deviation': None, 'Min': None, 'Max': None, 'Count': 0,
+    }
+    single = summarize_frequencies({4: 1})
+    assert (single['Mean'], single['Median'], single['Variance']) == (4, 4, None)
+    # Even count: the median averages the two middle values
+    assert summarize_frequencies({1: 2, 5: 2})['Median'] == 3
+
+
+def test_aggregate_counts_tables_and_dicts_alike():
+    records = [
+        record(1, '[Bowl]', 'Mary Cassatt'),
+        record(2, 'Bowl', None),
+        record(3, '', ''),
+        {'object_id': 4, 'title': 'Cup', 'people': [{'name': 'Paul Cezanne'}]},
+    ]
+    from_dicts = aggregate(records)
+    assert from_dicts['title_counts'] == {'Bowl': 2, 'Unknown Title': 1, 'Cup': 1}
+    assert from_dicts['artist_counts'] == {'Mary Cassatt': 1, UNKNOWN_ARTIST: 2, 'Paul Cezanne': 1}
+
+    fields = ('title', 'artist_name')
+    table = RecordTable.from_rows(fields, [(r['title'], r['artist_name']) for r in records[:3]])
+    from_table = aggregate(table)
+    assert from_table['total'] == 3
+    assert from_table['artist_counts'] == {'Mary Cassatt': 1, UNKNOWN_ARTIST: 2}
+
+
+def test_nameless_people_count_as_unknown_artist():
+    normalized = normalize_record({'objectid': 1, 'title': 'Bowl', 'people': [{'role': 'Artist'}]})
+    assert normalized['artist_name'] is None
+    assert aggregate([normalized, record(2)])['artist_counts'] == {UNKNOWN_ARTIST: 2}
+
+
+def test_top_with_other():
+    assert top_with_other([('a', 5), ('b', 3)], 10) == [
+        {'label': 'a', 'count': 5}, {'label': 'b', 'count': 3}, {'label': 'Other', 'count': 2},
+    ]
+    assert top_with_other([('a', 5)], 5) == [{'label': 'a', 'count': 5}]
@@ -0,0 +1,53 @@
+import json
+
+from columns import RecordTable
+from conftest import record
+
+RECORDS = [
+    {'object_id': 1, 'title': 'Bowl', 'image_url': None, 'artist_name': 'Mary Cassatt',
+     'persistent_link': 'https://hvrd.art/o/1', 'lastupdate': '2024-01-01'},
+    {'object_id': 2, 'title': 'Bowl', 'image_url': 'https://img/2', 'artist_name': None,
+     'persistent_link': 'https://hvrd.art/o/2', 'lastupdate': None},
+    {'object_id': 3, 'title': 'Käthe "quoted" \\ back\nslash ☃', 'image_url': '',
+     'artist_name': 'Käthe Kollwitz', 'persistent_link': 'No link available', 'lastupdate': '2024-02-01'},
+    {'object_id': 2 ** 40, 'title': '\U0001f3a8 emoji\t', 'image_url': '</script>',
+     'artist_name': 'Mary Cassatt', 'persistent_link': '', 'lastupdate': '2024-03-01'},
+]
+FIELDS = tuple(RECORDS[0])
+
+
+def table(fields=FIELDS, records=RECORDS):
+    return RecordTable.from_rows(fields, ([r[field] for field in fields] for r in records), batch_size=3)
+
+
+def test_to_json_matches_json_dumps():
+    assert table().to_json() == json.dumps(RECORDS)
+
+
+def test_to_json_with_a_subset_of_fields():
+    fields = ('object_id', 'title')
+    expected = json.dumps([{field: r[field] for field in fields} for r in RECORDS])
+    assert table().to_json(fields) == expected
+    assert table(fields).to_json() == expected
+
+
+def test_empty_table():
+    assert table(records=[]).to_json() == json.dumps([])
+    assert len(table(records=[])) == 0
+
+
+def test_rows_and_value_counts():
+    records = table()
+    assert len(records) == 4
+    assert records[2].as_dict() == RECORDS[2]
+    assert records[1]['artist_name'] is None
+    assert records[0].get('missing', 'default') == 'default'
+    assert records.value_counts('title') == {'Bowl': 2, RECORDS[2]['title']: 1, RECORDS[3]['title']: 1}
+    assert records.value_counts('artist_name', lambda name: name or 'Unknown') == {
+        'Mary Cassatt': 2, 'Unknown': 1, 'Käthe Kollwitz': 1,
+    }
+
+
+def test_store_table_matches_stored_records(store):
+    store.upsert_many(RECORDS + [record(5)])
+    assert store.load_table().to_json() == json.dumps(list(store.iter_records()))
@@ -0,0 +1,56 @@
+from conftest import record
+from store import ArtStore
+
+
+def counts(store, dimension):
+    return dict(store.top_counts(dimension, 100))
+
+
+def delete(store, object_id):
+    with store.connect() as conn:
+        conn.execute('DELETE FROM objects WHERE object_id = ?', (object_id,))
+
+
+def test_count_triggers_follow_inserts_updates_and_deletes(store):
+    store.upsert_many([
+        record(1, 'Bowl', 'Mary Cassatt'),
+        record(2, 'Bowl', None),
+        record(3, 'Cup', ''),
+    ])
+    assert counts(store, 'title') == {'Bowl': 2, 'Cup': 1}
+    assert counts(store, 'artist') == {'Mary Cassatt': 1, 'Unknown Artist': 2}
+
+    store.upsert_many([record(2, 'Vase', 'Paul Cezanne')])
+    assert counts(store, 'title') == {'Bowl': 1, 'Cup': 1, 'Vase': 1}
+    assert counts(store, 'artist') == {'Mary Cassatt': 1, 'Paul Cezanne': 1, 'Unknown Artist': 1}
+
+    delete(store, 1)
+    assert counts(store, 'title') == {'Cup': 1, 'Vase': 1}
+    assert store.label_count('artist', 'Mary Cassatt') == 0
+    assert store.count_frequencies('title') == {1: 2}
+
+
+def test_backfill_for_stores_created_before_the_count_tables(tmp_path):
+    path = str(tmp_path / 'old.db')
+    store = ArtStore(path)
+    store.upsert_many([record(1, 'Bowl'), record(2, 'Bowl', 'Mary Cassatt')])
+    with store.connect() as conn:
+        conn.execute('DELETE FROM title_counts')
+        conn.execute('DELETE FROM artist_counts')
+
+    reopened = ArtStore(path)
+    assert counts(reopened, 'title') == {'Bowl': 2}
+    assert counts(reopened, 'artist') == {'Mary Cassatt': 1, 'Unknown Artist': 1}
+
+
+def test_stats_endpoint_reads_the_count_tables(app_module):
+    app_module.store.upsert_many([
+        record(1, 'Bowl', 'Mary Cassatt'),
+        record(2, 'Bowl', 'Mary Cassatt'),
+        record(3, 'Cup', None),
+    ])
+    stats = app_module.app.test_client().get('/api/stats?top=1').json
+    assert stats['total'] == 3
+    assert stats['titles']['distinct'] == 2
+    assert stats['titles']['counts'] == [{'label': 'Bowl', 'count': 2}, {'label': 'Other', 'count': 1}]
+    assert stats['artists']['statistics']['Max'] == 2
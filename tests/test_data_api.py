@@ -0,0 +1,49 @@
+import gzip
+import json
+
+import pytest
+
+from conftest import record
+
+
+@pytest.fixture
+def api(app_module):
+    app_module.store.upsert_many([record(i, f'Title {i}') for i in range(1, 51)])
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize('query', ['page=abc', 'per_page=x', 'cursor=foo', 'page=1.5'])
+def test_unparsable_pagination_is_rejected(api, query):
+    response = api.get(f'/api/data?{query}')
+    assert response.status_code == 400
+    assert 'must be an integer' in response.json['error']
+
+
+def test_pages_by_offset_and_cursor(api):
+    page = api.get('/api/data?page=2&per_page=20').json
+    assert [r['object_id'] for r in page['records']] == list(range(21, 41))
+    assert page['info']['next_cursor'] == 40
+    after = api.get('/api/data?cursor=40&per_page=20&fields=object_id').json
+    assert after['records'] == [{'object_id': i} for i in range(41, 51)]
+    assert after['info']['next_cursor'] is None
+
+
+def test_unknown_fields_are_rejected(api):
+    assert api.get('/api/data?fields=title,nope').status_code == 400
+
+
+def test_cached_body_is_served_in_the_accepted_encoding(api):
+    plain = api.get('/api/data')
+    zipped = api.get('/api/data', headers={'Accept-Encoding': 'gzip'})
+    assert plain.headers.get('Content-Encoding') is None
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in zipped.headers['Vary']
+    assert gzip.decompress(zipped.data) == plain.data
+    assert len(json.loads(plain.data)) == 50
+
+
+def test_ndjson_streams_one_record_per_line(api):
+    response = api.get('/api/data?format=ndjson&fields=object_id')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == [{'object_id': i} for i in range(1, 51)]
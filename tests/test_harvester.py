@@ -0,0 +1,36 @@
+from harvester import PLACEHOLDER_IMAGE_URL, harvest, normalize_record
+from stub_api import make_records
+
+
+def test_harvest_walks_every_page_in_order(stub, client):
+    records = list(harvest(client, stub.url, 'key', size=20, max_workers=3))
+    assert [r['object_id'] for r in records] == [r['objectid'] for r in stub.records]
+
+
+def test_harvest_stops_at_max_pages(stub, client):
+    records = list(harvest(client, stub.url, 'key', size=20, max_workers=3, max_pages=2))
+    assert len(records) == 40
+    assert records[-1]['object_id'] == stub.records[39]['objectid']
+
+
+def test_harvest_single_page(stub, client):
+    stub.records[:] = make_records(5)
+    assert len(list(harvest(client, stub.url, 'key', size=20))) == 5
+
+
+def test_normalize_record():
+    assert normalize_record({'objectid': 1}) is None
+
+    record = normalize_record({
+        'objectid': 1,
+        'title': '[Bowl] ',
+        'people': [{'name': 'Mary Cassatt'}],
+        'primaryimageurl': '/images/1.jpg',
+        'url': 'https://hvrd.art/o/1',
+    })
+    assert record['title'] == 'Bowl'
+    assert record['artist_name'] == 'Mary Cassatt'
+    assert record['image_url'] == 'https://api.harvardartmuseums.org/images/1.jpg'
+
+    assert normalize_record({'objectid': 2, 'title': 'Cup'})['image_url'] == PLACEHOLDER_IMAGE_URL
+
@@ -0,0 +1,145 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from conftest import record
+from images import FORMATS, THUMBNAIL_WIDTHS, DiskLRUCache, ImageProxy, ImageUnavailable, make_thumbnails
+from stub_api import StubServer, make_image, make_records
+
+
+class CountingClient:
+    # Wraps an upstream client and records every URL it fetches
+    def __init__(self, client):
+        self.client = client
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+        return self.client.get(url)
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class HTMLClient:
+    # Answers every URL with a 200 that is not an image
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+        return FakeResponse(b'<html>Not found</html>')
+
+
+@pytest.fixture
+def image_stub():
+    server = StubServer([])
+    base = server.url.replace('/object', '/images/')
+    server.httpd.RequestHandlerClass.records[:] = make_records(3, image_base=base)
+    with server:
+        yield server
+
+
+def test_thumbnails_in_every_width_and_format():
+    thumbnails = make_thumbnails(make_image(1, size=(1200, 900)))
+    assert set(thumbnails) == {(width, fmt) for width in THUMBNAIL_WIDTHS for fmt in FORMATS}
+    for (width, fmt), data in thumbnails.items():
+        image = Image.open(io.BytesIO(data))
+        assert image.format == fmt.upper()
+        assert image.size == (width, width * 3 // 4)
+
+
+def test_proxy_fetches_each_original_once(image_stub, client, tmp_path):
+    counting = CountingClient(client)
+    proxy = ImageProxy(counting, DiskLRUCache(str(tmp_path), 10 ** 7))
+    url = image_stub.httpd.RequestHandlerClass.records[0]['primaryimageurl'] + '.jpg'
+    paths = {proxy.get(url, width, fmt) for width in THUMBNAIL_WIDTHS for fmt in FORMATS}
+    assert len(paths) == len(THUMBNAIL_WIDTHS) * len(FORMATS)
+    assert all(os.path.exists(path) for path in paths)
+    assert counting.urls == [url]
+
+
+def test_undecodable_originals_fail_and_are_remembered(tmp_path):
+    client = HTMLClient()
+    proxy = ImageProxy(client, DiskLRUCache(str(tmp_path), 10 ** 7), failure_ttl=60)
+    for _ in range(3):
+        with pytest.raises(ImageUnavailable, match='UnidentifiedImageError'):
+            proxy.get('https://example.org/page', 320, 'jpeg')
+    assert client.urls == ['https://example.org/page']
+
+
+def put_at(cache, name, size, mtime):
+    path = cache.put(name, b'x' * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_lru_eviction_follows_recency(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=250)
+    put_at(cache, 'a', 100, 1000)
+    put_at(cache, 'b', 100, 2000)
+    assert cache.get('a') is not None  # Now the most recently used
+    cache.put('c', b'x' * 100)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+
+def test_processes_sharing_a_directory_share_the_bound(tmp_path):
+    first = DiskLRUCache(str(tmp_path), max_bytes=300)
+    second = DiskLRUCache(str(tmp_path), max_bytes=300)
+    put_at(first, 'a', 100, 1000)
+    put_at(second, 'b', 100, 2000)
+    put_at(first, 'c', 100, 3000)
+    assert second.get('a') is not None  # Written by the other cache
+    os.utime(tmp_path / 'a', (1000, 1000))
+    second.put('d', b'x' * 100)
+    files = sorted(name for name in os.listdir(tmp_path) if not name.startswith('.'))
+    assert files == ['b', 'c', 'd']
+
+
+@pytest.fixture
+def image_api(app_module, monkeypatch, tmp_path):
+    app_module.store.upsert_many([
+        record(1, image_url='https://example.org/broken'),
+        record(2, image_url=None),
+    ])
+    monkeypatch.setattr(app_module, 'image_proxy', ImageProxy(HTMLClient(), DiskLRUCache(str(tmp_path), 10 ** 7)))
+    return app_module
+
+
+def test_image_route_answers_502_for_undecodable_images(image_api):
+    client = image_api.app.test_client()
+    for _ in range(2):
+        response = client.get('/img/1')
+        assert response.status_code == 502
+        assert 'UnidentifiedImageError' in response.json['error']
+    assert image_api.image_proxy.client.urls == ['https://example.org/broken']
+    assert client.get('/img/2').status_code == 404
+    assert client.get('/img/3').status_code == 404
+
+
+def test_image_route_serves_ranges_and_304(app_module, image_stub, client, monkeypatch, tmp_path):
+    url = image_stub.httpd.RequestHandlerClass.records[0]['primaryimageurl'] + '.jpg'
+    app_module.store.upsert_many([record(1, image_url=url)])
+    monkeypatch.setattr(app_module, 'image_proxy', ImageProxy(client, DiskLRUCache(str(tmp_path), 10 ** 7)))
+    api = app_module.app.test_client()
+
+    response = api.get('/img/1?w=300', headers={'Accept': 'image/webp'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert Image.open(io.BytesIO(response.data)).size[0] == 320
+    assert 'immutable' in response.headers['Cache-Control']
+
+    jpeg = api.get('/img/1?w=100', headers={'Accept': 'image/jpeg'})
+    assert jpeg.mimetype == 'image/jpeg'
+
+    partial = api.get('/img/1?w=300', headers={'Accept': 'image/webp', 'Range': 'bytes=0-9'})
+    assert partial.status_code == 206
+    assert partial.data == response.data[:10]
+
+    etag = response.headers['ETag']
+    cached = api.get('/img/1?w=300', headers={'Accept': 'image/webp', 'If-None-Match': etag})
+    assert cached.status_code == 304
@@ -0,0 +1,64 @@
+import threading
+
+from conftest import record
+from report_cache import ReportCache, report_key
+from store import sync_store
+
+
+def test_idle_sync_keeps_the_store_version(stub, client, store):
+    sync_store(store, client, stub.url, 'key', size=50)
+    version = store.version()
+    # The watermark day is fetched again, but nothing in it changed
+    assert sync_store(store, client, stub.url, 'key', size=50) > 0
+    assert store.version() == version
+
+    stub.records.append(dict(stub.records[0], title='Renamed', lastupdate='2025-01-01T00:00:00-0400'))
+    sync_store(store, client, stub.url, 'key', size=50)
+    assert store.version() != version
+
+
+def test_snapshot_ignores_concurrent_writes(store):
+    store.upsert_many([record(1)])
+    with store.snapshot():
+        version = store.version()
+        writer = threading.Thread(target=store.upsert_many, args=([record(2)],))
+        writer.start()
+        writer.join()
+        assert store.version() == version
+        assert store.count() == 1
+    assert store.count() == 2
+
+
+def test_report_cache_builds_once_per_key():
+    cache = ReportCache(1024)
+    builds = []
+    build = lambda: builds.append(1) or b'pdf'
+    assert cache.get_or_build('a', build) == b'pdf'
+    assert cache.get_or_build('a', build) == b'pdf'
+    assert len(builds) == 1
+    assert report_key('v1', 'May 1') != report_key('v2', 'May 1')
+
+
+def test_report_etag_and_conditional_get(app_module, monkeypatch):
+    builds = []
+    monkeypatch.setattr(app_module, 'build_report', lambda aggregated, date, progress=None: builds.append(aggregated) or b'%PDF')
+    client = app_module.app.test_client()
+    assert client.get('/api/report').status_code == 503
+
+    app_module.store.upsert_many([record(1, 'Bowl'), record(2, 'Cup')])
+    first = client.get('/api/report')
+    assert first.status_code == 200 and first.data == b'%PDF'
+    etag = first.headers['ETag']
+    assert builds[0]['total'] == 2
+
+    # A 304 and a cache hit neither aggregate nor build again
+    assert client.get('/api/report', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/report').headers['ETag'] == etag
+    assert len(builds) == 1
+
+    # Re-writing identical records keeps the ETag; a real change moves it
+    app_module.store.upsert_many([record(1, 'Bowl')])
+    assert client.get('/api/report', headers={'If-None-Match': etag}).status_code == 304
+    app_module.store.upsert_many([record(1, 'Vase')])
+    assert client.get('/api/report', headers={'If-None-Match': etag}).status_code == 200
+    assert len(builds) == 2
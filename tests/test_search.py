@@ -0,0 +1,81 @@
+from conftest import record
+from harvester import PLACEHOLDER_IMAGE_URL
+from search import SearchIndex
+from store import ArtStore
+
+
+def delete(store, object_id):
+    with store.connect() as conn:
+        conn.execute('DELETE FROM objects WHERE object_id = ?', (object_id,))
+
+
+def test_change_log_moves_objects_to_the_end(store):
+    store.upsert_many([record(1), record(2), record(3)])
+    changes = list(store.changes_since(0))
+    assert [object_id for _, object_id, _ in changes] == [1, 2, 3]
+    seq = changes[-1][0]
+
+    store.upsert_many([record(1, 'Renamed')])
+    delete(store, 2)
+    changes = list(store.changes_since(seq, ('title',)))
+    assert [(object_id, data) for _, object_id, data in changes] == [(1, {'title': 'Renamed'}), (2, None)]
+
+    # One row per object, so the whole log stays as long as the collection
+    assert len(list(store.changes_since(0))) == 3
+
+
+def test_change_log_is_backfilled_for_older_stores(tmp_path):
+    path = str(tmp_path / 'old.db')
+    store = ArtStore(path)
+    store.upsert_many([record(2), record(1)])
+    with store.connect() as conn:
+        conn.execute('DELETE FROM changes')
+
+    reopened = ArtStore(path)
+    assert [object_id for _, object_id, _ in reopened.changes_since(0)] == [1, 2]
+    assert SearchIndex(reopened).search() == [1, 2]
+
+
+def test_refresh_applies_only_new_changes(store):
+    store.upsert_many([
+        record(1, 'Portrait of a Woman', 'Mary Cassatt', 'https://img/1'),
+        record(2, 'Still Life', 'Paul Cezanne', PLACEHOLDER_IMAGE_URL),
+        record(3, 'Portrait Study', 'Mary Cassatt', 'https://img/3'),
+    ])
+    index = SearchIndex(store)
+    assert index.refresh() == 3
+    assert index.refresh() == 0
+
+    assert index.search(text='portrait') == [1, 3]
+    assert index.search(title='still') == [2]
+    assert index.search(artist='mary cassatt', text='study') == [3]
+    assert index.search(has_image=False) == [2]
+    assert index.search(link='https://hvrd.art/o/3') == [3]
+
+    # An update moves the object between postings; a delete drops it
+    store.upsert_many([record(1, 'Landscape', 'Paul Cezanne', 'https://img/1')])
+    delete(store, 3)
+    store.upsert_many([record(4, 'Portrait of a Man', None, None)])
+    assert index.refresh() == 3
+
+    assert index.search(text='portrait') == [4]
+    assert index.search(title='land') == [1]
+    assert index.search(artist='Paul Cezanne') == [1, 2]
+    assert index.search(artist='Mary Cassatt') == []
+    assert index.search(link='3') == []
+    assert index.search() == [1, 2, 4]
+
+
+def test_search_refreshes_before_answering(store):
+    index = SearchIndex(store)
+    assert index.search(text='bowl') == []
+    store.upsert_many([record(7, 'Bowl')])
+    assert index.search(text='bowl') == [7]
+
+
+def test_filters_combine_with_and(store):
+    store.upsert_many([record(1, 'Bowl', 'Mary Cassatt'), record(2, 'Bowl', 'Paul Cezanne')])
+    index = SearchIndex(store)
+    assert index.search(text='bowl', artist='paul cezanne') == [2]
+    assert index.search(text='bowl cup') == []
+    assert index.search(text='   ') == []
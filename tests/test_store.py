@@ -0,0 +1,61 @@
+from conftest import record
+from store import ArtStore, sync_lock, sync_store
+
+
+def test_store_is_not_opened_until_first_use(tmp_path):
+    path = tmp_path / 'lazy.db'
+    store = ArtStore(str(path))
+    assert not path.exists()
+    assert store.count() == 0
+    assert path.exists()
+
+
+def test_upsert_replaces_records_by_id(store):
+    store.upsert_many([record(1, 'Bowl'), record(2, 'Cup')])
+    store.upsert_many([record(1, 'Vase', 'Mary Cassatt')])
+    assert store.count() == 2
+    assert store.get(1, ('title', 'artist_name')) == {'title': 'Vase', 'artist_name': 'Mary Cassatt'}
+    assert store.get(3) is None
+
+
+def test_upsert_skips_records_without_an_id(store):
+    assert store.upsert_many([record(None), record(1)]) == 1
+    assert store.count() == 1
+
+
+def test_page_by_offset_and_cursor(store):
+    store.upsert_many([record(i) for i in range(1, 11)])
+    records, last_id = store.page(('title',), limit=4, offset=4)
+    assert last_id == 8
+    records, last_id = store.page(('title',), limit=4, after=8)
+    assert len(records) == 2 and last_id == 10
+
+
+def test_sync_store_is_incremental(stub, client, store):
+    assert sync_store(store, client, stub.url, 'key', size=50) == 250
+    assert store.count() == 250
+    watermark = store.get_meta('lastupdate')
+    assert watermark == max(r['lastupdate'] for r in stub.records)
+
+    # The next sync only asks for records changed since the watermark
+    changed = dict(stub.records[0], title='Renamed', lastupdate='2025-01-01T00:00:00-0400')
+    stub.records.append(changed)
+    synced = sync_store(store, client, stub.url, 'key', size=50)
+    assert synced < 250
+    assert store.get(changed['objectid'])['title'] == 'Renamed'
+    assert store.count() == 250
+
+
+def test_sync_store_skips_while_another_process_syncs(stub, client, store):
+    with sync_lock(store.path) as acquired:
+        assert acquired
+        assert sync_store(store, client, stub.url, 'key', size=50) == 0
+    assert store.count() == 0
+    assert sync_store(store, client, stub.url, 'key', size=50) == 250
+
+
+def test_sync_store_skips_within_min_interval(stub, client, store):
+    assert sync_store(store, client, stub.url, 'key', size=50, min_interval=60) == 250
+    stub.records.append(dict(stub.records[0], objectid=1, lastupdate='2025-01-01T00:00:00-0400'))
+    assert sync_store(store, client, stub.url, 'key', size=50, min_interval=60) == 0
+    assert sync_store(store, client, stub.url, 'key', size=50) > 0
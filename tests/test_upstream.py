@@ -0,0 +1,117 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from upstream import TokenBucket, UpstreamClient
+
+
+def test_token_bucket_allows_a_burst_up_to_capacity():
+    bucket = TokenBucket(rate=1, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # The first token is free, the other five arrive 50 ms apart
+    assert time.monotonic() - start >= 0.2
+
+
+def test_token_bucket_disabled_by_zero_rate():
+    bucket = TokenBucket(rate=0)
+    start = time.monotonic()
+    for _ in range(1000):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+
+def test_client_fetches_json(stub, client):
+    data = client.get_json(stub.url, params={'page': 2, 'size': 10})
+    assert data['info']['page'] == 2
+    assert len(data['records']) == 10
+
+
+def test_client_raises_on_client_errors(stub, client):
+    with pytest.raises(requests.HTTPError):
+        client.get(stub.url.replace('/object', '/missing'))
+
+
+def test_retries_server_errors_with_backoff(stub):
+    stub.fail_next(503, 502)
+    client = UpstreamClient(retries=3, backoff=0.01)
+    assert client.get_json(stub.url, params={'size': 5})['info']['totalrecords'] == 250
+    assert len(stub.requests) == 3
+
+
+def test_honours_retry_after_on_429(stub):
+    stub.fail_next(429, retry_after=1)
+    client = UpstreamClient(retries=1, backoff=0.01)
+    start = time.monotonic()
+    client.get(stub.url)
+    assert time.monotonic() - start >= 1
+    assert len(stub.requests) == 2
+
+
+def test_retry_after_is_capped_by_max_backoff(stub):
+    stub.fail_next(503, retry_after=60)
+    client = UpstreamClient(retries=1, backoff=0.01, max_backoff=0.1)
+    start = time.monotonic()
+    client.get(stub.url)
+    assert time.monotonic() - start < 5
+
+
+def test_gives_up_after_the_last_retry(stub):
+    stub.fail_next(503, 503, 503)
+    client = UpstreamClient(retries=2, backoff=0.01)
+    with pytest.raises(requests.HTTPError) as error:
+        client.get(stub.url)
+    assert error.value.response.status_code == 503
+    assert len(stub.requests) == 3
+
+
+def test_does_not_retry_client_errors(stub):
+    stub.fail_next(404)
+    with pytest.raises(requests.HTTPError):
+        UpstreamClient(retries=3, backoff=0.01).get(stub.url)
+    assert len(stub.requests) == 1
+
+
+def test_read_timeouts_are_retried_then_raised(stub):
+    stub.set_delay(0.5)
+    client = UpstreamClient(retries=1, backoff=0.01, timeout=(1, 0.1))
+    with pytest.raises(requests.Timeout):
+        client.get(stub.url)
+    assert len(stub.requests) == 2
+
+
+def test_concurrent_identical_requests_share_one_fetch(stub):
+    stub.set_delay(0.3)
+    client = UpstreamClient(retries=0)
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: client.get_json(stub.url, params={'page': 1, 'size': 5}), range(5)))
+    assert len(stub.requests) == 1
+    assert all(result is results[0] for result in results)
+
+    # Different parameters are separate requests
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(lambda page: client.get_json(stub.url, params={'page': page, 'size': 5}), (1, 2)))
+    assert len(stub.requests) == 3
+
+
+def test_coalesced_callers_share_the_error(stub):
+    stub.set_delay(0.3)
+    stub.fail_next(404)
+    client = UpstreamClient(retries=0)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(client.get_json, stub.url) for _ in range(3)]
+        for future in futures:
+            with pytest.raises(requests.HTTPError):
+                future.result()
+    assert len(stub.requests) == 1
@@ -0,0 +1,27 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from workers import ProcessPool
+
+
+def test_pool_replaces_itself_after_a_worker_dies():
+    pool = ProcessPool(max_workers=1)
+    try:
+        assert pool.submit(pow, 2, 10).result() == 1024
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(os._exit, 1).result()
+        assert pool.submit(pow, 3, 2).result() == 9
+    finally:
+        pool.executor.shutdown()
+
+
+def test_chart_render_errors_are_json(app_module, monkeypatch):
+    def fail(*args):
+        raise BrokenProcessPool('worker died')
+
+    monkeypatch.setattr(app_module.chart_artifacts, 'get', fail)
+    response = app_module.app.test_client().get('/api/charts/pie')
+    assert response.status_code == 500
+    assert response.json == {'error': 'Chart render failed: worker died'}
@@ -0,0 +1,131 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import log_event, timed
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    # Blocking token bucket shared by all callers so the combined request
+    # rate stays under the upstream limit.
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_session(pool_size=10):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class UpstreamClient:
+    # Shared HTTP client for every upstream call: one keep-alive connection
+    # pool, a (connect, read) timeout on every request, jittered exponential
+    # backoff on 429/5xx and connection errors, and coalescing of identical
+    # in-flight JSON requests so concurrent callers share one response.
+    def __init__(self, pool_size=10, timeout=(5, 30), retries=3, backoff=0.5, max_backoff=30,
+                 rate_limiter=None):
+        self.session = create_session(pool_size)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limiter = rate_limiter
+        self.lock = threading.Lock()
+        self.inflight = {}
+
+    def _delay(self, attempt, response=None):
+        # Honour Retry-After when the server sends one in seconds; otherwise
+        # use "full jitter" backoff so retrying workers spread out
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get(self, url, params=None):
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                with timed('upstream_fetch'):
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                delay = self._delay(attempt)
+                reason = type(e).__name__
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response
+                delay = self._delay(attempt, response)
+                reason = response.status_code
+                response.close()
+
+            log_event(logger, logging.WARNING, 'upstream.retry', url=url, attempt=attempt + 1,
+                      reason=reason, delay=round(delay, 2))
+            time.sleep(delay)
+
+    def get_json(self, url, params=None):
+        # Identical concurrent requests share the first caller's response.
+        # The parsed body is shared too, so callers must not mutate it.
+        key = (url, tuple(sorted((params or {}).items())))
+        with self.lock:
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.inflight[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self.get(url, params).json()
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            flight.event.set()
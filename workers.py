@@ -0,0 +1,63 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class ProcessPool:
+    # Long-lived ProcessPoolExecutor, started on first use. A worker that
+    # dies (out of memory, a crash inside PIL or Agg) breaks the whole
+    # executor; the next submit then replaces it rather than every later
+    # task failing for the life of the process. The task that was running
+    # when the worker died still fails.
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def _current(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self.executor
+
+    def _replace(self, broken):
+        with self.lock:
+            if self.executor is broken:
+                logger.warning('Process pool is broken; starting a new one')
+                broken.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+    def submit(self, fn, *args, **kwargs):
+        executor = self._current()
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            self._replace(executor)
+            return self._current().submit(fn, *args, **kwargs)
+
+
+    def pids(self):
+        # Process ids of the live workers, e.g. for measuring their memory
+        executor = self.executor
+        return list(getattr(executor, '_processes', None) or ())
+
+
+def get_process_pool(max_workers=3):
+    # Shared process pool for chart rendering, PDF section builds and
+    # thumbnails. Workers are spawned rather than forked so they never
+    # inherit the server's threads or open database connections.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPool(max_workers)
+        return _pool